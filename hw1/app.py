@@ -1,4 +1,348 @@
-from typing import Any, Awaitable, Callable
+import asyncio
+import json
+import math
+import sys
+from dataclasses import dataclass
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Iterator
+from urllib.parse import parse_qs
+
+Scope = dict[str, Any]
+Receive = Callable[[], Awaitable[dict[str, Any]]]
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+
+# Разделители чисел в потоковом теле: запятые, пробельные символы и скобки
+# JSON-массива, поэтому на вход годится и `1,2,3`, и `[1, 2, 3]`
+_SEPARATORS = b",[]\t\r\n"
+_SEPARATORS_TABLE = bytes.maketrans(_SEPARATORS, b" " * len(_SEPARATORS))
+
+# Самое длинное разумное представление float с запасом
+MAX_NUMBER_LENGTH = 64
+
+# Чанки потокового ответа копятся до этого размера, чтобы не дергать `send`
+# на каждое число
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# log10 золотого сечения: примерно столько десятичных цифр добавляет каждый
+# следующий член последовательности Фибоначчи
+_FIBONACCI_DIGITS_PER_STEP = 0.20899
+
+
+class RequestError(Exception):
+    def __init__(self, status: HTTPStatus, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+class NumberTokenizer:
+    """Потоковый разбор чисел из чанков тела запроса.
+
+    Между вызовами `feed` хранится только недочитанный хвост последнего числа,
+    поэтому память ограничена размером чанка и не зависит от размера тела.
+    """
+
+    def __init__(self, max_number_length: int = MAX_NUMBER_LENGTH):
+        self._max_number_length = max_number_length
+        self._tail = b""
+
+    def feed(self, chunk: bytes) -> Iterator[float]:
+        data = self._tail + chunk.translate(_SEPARATORS_TABLE)
+        tokens = data.split()
+        self._tail = b""
+
+        # число на границе чанка может продолжиться в следующем
+        # bytes.split режет и по \x0b, \x0c, которых нет в _SEPARATORS
+        if tokens and not data[-1:].isspace():
+            self._tail = tokens.pop()
+            if len(self._tail) > self._max_number_length:
+                raise RequestError(
+                    HTTPStatus.UNPROCESSABLE_ENTITY,
+                    "number is too long",
+                )
+
+        for token in tokens:
+            yield _parse_number(token)
+
+    def close(self) -> Iterator[float]:
+        if self._tail:
+            yield _parse_number(self._tail)
+            self._tail = b""
+
+
+@dataclass(slots=True)
+class RunningStats:
+    """Бегущие среднее и дисперсия по алгоритму Уэлфорда.
+
+    Среднее обновляется на месте, без суммы: сумма конечных чисел может
+    переполниться там, где среднее еще представимо.
+    """
+
+    count: int = 0
+    welford_mean: float = 0.0
+    m2: float = 0.0
+
+    def push(self, value: float) -> None:
+        self.count += 1
+
+        delta = value - self.welford_mean
+        self.welford_mean += delta / self.count
+        self.m2 += delta * (value - self.welford_mean)
+
+    @property
+    def mean(self) -> float:
+        return self.welford_mean
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count
+
+
+def _parse_number(token: bytes) -> float:
+    try:
+        value = float(token)
+    except ValueError:
+        raise RequestError(
+            HTTPStatus.UNPROCESSABLE_ENTITY,
+            f"invalid number: {token[:MAX_NUMBER_LENGTH]!r}",
+        ) from None
+
+    if not math.isfinite(value):
+        raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, "number must be finite")
+
+    return value
+
+
+def _parse_int(value: str | None) -> int:
+    if value is None:
+        raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, "parameter is required")
+
+    try:
+        return int(value)
+    except ValueError:
+        raise RequestError(
+            HTTPStatus.UNPROCESSABLE_ENTITY,
+            "parameter must be an integer",
+        ) from None
+
+
+def _query_params(scope: Scope) -> dict[str, list[str]]:
+    return parse_qs(scope.get("query_string", b"").decode(), keep_blank_values=True)
+
+
+def _is_truthy(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes")
+
+
+async def _read_body(receive: Receive) -> bytes:
+    body = bytearray()
+
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+
+        if not message.get("more_body", False):
+            return bytes(body)
+
+
+async def _send_json(send: Send, status: HTTPStatus, payload: Any) -> None:
+    body = json.dumps(payload).encode()
+
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _wait_disconnect(receive: Receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _lifespan(receive: Receive, send: Send) -> None:
+    while True:
+        message = await receive()
+
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+def factorial(scope: Scope) -> int:
+    n = _parse_int(_query_params(scope).get("n", [None])[0])
+
+    if n < 0:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "n must be non-negative")
+
+    # log10(n!) через lgamma: число цифр известно до вычисления факториала
+    _check_result_digits(n, lambda n: math.lgamma(n + 1) / math.log(10))
+
+    return math.factorial(n)
+
+
+def fibonacci(raw_n: str) -> int:
+    n = _validate_fibonacci_n(raw_n)
+
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+
+    return a
+
+
+def _validate_fibonacci_n(raw_n: str) -> int:
+    n = _parse_int(raw_n)
+
+    if n < 0:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "n must be non-negative")
+
+    _check_result_digits(n, lambda n: n * _FIBONACCI_DIGITS_PER_STEP)
+
+    return n
+
+
+def _check_result_digits(n: int, digits: Callable[[int], float]) -> None:
+    """json.dumps не сериализует int длиннее sys.get_int_max_str_digits()
+
+    `digits(n)` - оценка числа цифр результата во float. И у n!, и у n-го
+    числа Фибоначчи цифр не меньше n / 5, поэтому большие n отсекаются
+    сравнением целых: на них float-арифметика переполняется.
+    """
+    max_digits = sys.get_int_max_str_digits()
+    if max_digits and (n > 5 * max_digits or digits(n) > max_digits):
+        raise RequestError(HTTPStatus.BAD_REQUEST, "n is too large")
+
+
+async def fibonacci_sequence(raw_n: str, receive: Receive, send: Send) -> None:
+    """Первые n чисел Фибоначчи в виде `{"result": [...]}`, отдаваемые по мере генерации
+
+    Заголовки и начало JSON уходят сразу, дальше числа копятся в буфер
+    до `STREAM_CHUNK_SIZE` и отправляются чанками с `more_body=True`.
+    `await send` дает серверу придержать нас, пока клиент не вычитал данные,
+    а фоновая задача следит за `http.disconnect`, чтобы не считать впустую.
+    """
+    n = _validate_fibonacci_n(raw_n)
+
+    await send(
+        {
+            "type": "http.response.start",
+            "status": HTTPStatus.OK,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send(
+        {"type": "http.response.body", "body": b'{"result": [', "more_body": True}
+    )
+
+    disconnected = asyncio.create_task(_wait_disconnect(receive))
+    try:
+        buffer: list[str] = []
+        buffered = 0
+        a, b = 0, 1
+
+        for i in range(n):
+            item = str(a) if i == 0 else f", {a}"
+            buffer.append(item)
+            buffered += len(item)
+            a, b = b, a + b
+
+            if buffered >= STREAM_CHUNK_SIZE:
+                # отдаем управление циклу, чтобы успеть заметить отключение
+                await asyncio.sleep(0)
+                if disconnected.done():
+                    return
+
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": "".join(buffer).encode(),
+                        "more_body": True,
+                    }
+                )
+                buffer.clear()
+                buffered = 0
+
+        buffer.append("]}")
+        await send({"type": "http.response.body", "body": "".join(buffer).encode()})
+    finally:
+        disconnected.cancel()
+
+
+async def mean(scope: Scope, receive: Receive) -> float:
+    body = await _read_body(receive)
+
+    if body:
+        try:
+            numbers = json.loads(body)
+        except ValueError:
+            raise RequestError(
+                HTTPStatus.UNPROCESSABLE_ENTITY,
+                "body must be a json list",
+            ) from None
+    elif "numbers" in (params := _query_params(scope)):
+        numbers = [n for n in params["numbers"][0].split(",") if n]
+    else:
+        raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, "numbers are required")
+
+    if not isinstance(numbers, list):
+        raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, "numbers must be a list")
+
+    if not numbers:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "numbers must not be empty")
+
+    try:
+        values = [float(n) for n in numbers]
+    except (TypeError, ValueError):
+        raise RequestError(
+            HTTPStatus.UNPROCESSABLE_ENTITY,
+            "numbers must be numeric",
+        ) from None
+
+    return sum(values) / len(values)
+
+
+async def streaming_mean(scope: Scope, receive: Receive) -> dict[str, float]:
+    """Среднее по телу произвольного размера, читаемому чанками из `receive`"""
+    tokenizer = NumberTokenizer()
+    stats = RunningStats()
+
+    while True:
+        message = await receive()
+
+        if message["type"] == "http.disconnect":
+            raise RequestError(HTTPStatus.BAD_REQUEST, "client disconnected")
+
+        for value in tokenizer.feed(message.get("body", b"")):
+            stats.push(value)
+
+        if not message.get("more_body", False):
+            break
+
+    for value in tokenizer.close():
+        stats.push(value)
+
+    if not stats.count:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "numbers must not be empty")
+
+    result = {"result": stats.mean}
+
+    if any(_is_truthy(v) for v in _query_params(scope).get("variance", [])):
+        result["variance"] = stats.variance
+
+    # json.dumps пишет inf и nan как Infinity и NaN, а это уже не JSON
+    if not all(map(math.isfinite, result.values())):
+        raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, "result is out of float range")
+
+    return result
 
 
 async def application(
@@ -12,7 +356,34 @@ async def application(
         receive: Корутина для получения сообщений от клиента
         send: Корутина для отправки сообщений клиенту
     """
-    # TODO: Ваша реализация здесь
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+
+    method = scope["method"]
+    path = scope["path"].rstrip("/")
+
+    try:
+        match method, path.split("/")[1:]:
+            case "GET", ["fibonacci", n, "sequence"]:
+                await fibonacci_sequence(n, receive, send)
+                return
+            case "GET", ["factorial"]:
+                payload = {"result": factorial(scope)}
+            case "GET", ["fibonacci", n]:
+                payload = {"result": fibonacci(n)}
+            case "GET", ["mean"]:
+                payload = {"result": await mean(scope, receive)}
+            case "POST", ["mean"]:
+                payload = await streaming_mean(scope, receive)
+            case _:
+                raise RequestError(HTTPStatus.NOT_FOUND, "not found")
+    except RequestError as e:
+        await _send_json(send, e.status, {"detail": e.detail})
+        return
+
+    await _send_json(send, HTTPStatus.OK, payload)
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,3 +1,4 @@
+import json
 from http import HTTPStatus
 from typing import Any
 
@@ -38,6 +39,9 @@ async def test_not_found(method: str, path: str):
         ({"n": 0}, HTTPStatus.OK),
         ({"n": 1}, HTTPStatus.OK),
         ({"n": 10}, HTTPStatus.OK),
+        ({"n": 1000}, HTTPStatus.OK),
+        ({"n": 5000}, HTTPStatus.BAD_REQUEST),
+        ({"n": "9" * 400}, HTTPStatus.BAD_REQUEST),
     ],
 )
 async def test_factorial(query: dict[str, Any], status_code: int):
@@ -58,6 +62,9 @@ async def test_factorial(query: dict[str, Any], status_code: int):
         ("/0", HTTPStatus.OK),
         ("/1", HTTPStatus.OK),
         ("/10", HTTPStatus.OK),
+        ("/20000", HTTPStatus.OK),
+        ("/30000", HTTPStatus.BAD_REQUEST),
+        ("/" + "9" * 400, HTTPStatus.BAD_REQUEST),
     ],
 )
 async def test_fibonacci(params: str, status_code: int):
@@ -87,3 +94,125 @@ async def test_mean(json: dict[str, Any] | None, status_code: int):
     assert response.status_code == status_code
     if status_code == HTTPStatus.OK:
         assert "result" in response.json()
+
+
+async def _chunked(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.asyncio()
+@pytest.mark.parametrize(
+    ("chunks", "status_code", "expected"),
+    [
+        ((b"",), HTTPStatus.BAD_REQUEST, None),
+        ((b"1,2,3",), HTTPStatus.OK, 2.0),
+        ((b"[1, 2.0, ", b"3.0]"), HTTPStatus.OK, 2.0),
+        ((b"1", b"0,2", b"0\n3", b"0"), HTTPStatus.OK, 20.0),
+        ((b"1 2\x0b", b"3"), HTTPStatus.OK, 2.0),
+        ((b"1 2\x0c", b"3"), HTTPStatus.OK, 2.0),
+        ((b"1,lol,3",), HTTPStatus.UNPROCESSABLE_ENTITY, None),
+        ((b"1,nan",), HTTPStatus.UNPROCESSABLE_ENTITY, None),
+        ((b"1" * 100,), HTTPStatus.UNPROCESSABLE_ENTITY, None),
+        ((b"1e308 1e308",), HTTPStatus.OK, 1e308),
+    ],
+)
+async def test_streaming_mean(
+    chunks: tuple[bytes, ...],
+    status_code: int,
+    expected: float | None,
+):
+    async with TestClient(app) as client:
+        response = await client.post("/mean", data=_chunked(*chunks))
+
+    assert response.status_code == status_code
+    if status_code == HTTPStatus.OK:
+        assert response.json()["result"] == pytest.approx(expected)
+
+
+@pytest.mark.asyncio()
+async def test_streaming_mean_variance():
+    numbers = [float(i) for i in range(10_000)]
+    body = ",".join(map(str, numbers)).encode()
+    chunks = [body[i : i + 7] for i in range(0, len(body), 7)]
+
+    async with TestClient(app) as client:
+        response = await client.post(
+            "/mean",
+            data=_chunked(*chunks),
+            query_string={"variance": "true"},
+        )
+
+    assert response.status_code == HTTPStatus.OK
+    mean = sum(numbers) / len(numbers)
+    variance = sum((n - mean) ** 2 for n in numbers) / len(numbers)
+    assert response.json() == {
+        "result": pytest.approx(mean),
+        "variance": pytest.approx(variance),
+    }
+
+
+@pytest.mark.asyncio()
+async def test_streaming_mean_variance_overflow():
+    async with TestClient(app) as client:
+        response = await client.post(
+            "/mean",
+            data=_chunked(b"1e308 -1e308"),
+            query_string={"variance": "true"},
+        )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio()
+@pytest.mark.parametrize(
+    ("params", "status_code", "expected"),
+    [
+        ("/lol/sequence", HTTPStatus.UNPROCESSABLE_ENTITY, None),
+        ("/-1/sequence", HTTPStatus.BAD_REQUEST, None),
+        ("/" + "9" * 400 + "/sequence", HTTPStatus.BAD_REQUEST, None),
+        ("/0/sequence", HTTPStatus.OK, []),
+        ("/1/sequence", HTTPStatus.OK, [0]),
+        ("/10/sequence", HTTPStatus.OK, [0, 1, 1, 2, 3, 5, 8, 13, 21, 34]),
+    ],
+)
+async def test_fibonacci_sequence(
+    params: str,
+    status_code: int,
+    expected: list[int] | None,
+):
+    async with TestClient(app) as client:
+        response = await client.get("/fibonacci" + params)
+
+    assert response.status_code == status_code
+    if status_code == HTTPStatus.OK:
+        assert response.json() == {"result": expected}
+
+
+@pytest.mark.asyncio()
+async def test_fibonacci_sequence_chunked():
+    async with TestClient(app) as client:
+        response = await client.get("/fibonacci/5000/sequence", stream=True)
+        chunks = [chunk async for chunk in response.iter_content(1 << 20)]
+
+    result = json.loads(b"".join(chunks))["result"]
+    assert len(chunks) > 2
+    assert len(result) == 5000
+    assert result[-1] == result[-2] + result[-3]
+
+
+@pytest.mark.asyncio()
+async def test_fibonacci_sequence_stops_on_disconnect():
+    messages = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/fibonacci/20000/sequence"}
+    await app(scope, receive, send)
+
+    assert messages[0]["status"] == HTTPStatus.OK
+    assert all(m.get("more_body") for m in messages[1:])
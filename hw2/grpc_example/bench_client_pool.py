@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+from hw2.grpc_example.client_pool import ExampleClientPool
+from hw2.grpc_example.example_service import serve
+
+
+async def _drive(
+    addresses: list[str],
+    duration: float,
+    concurrency: int,
+    channels_per_address: int,
+) -> int:
+    async with ExampleClientPool(addresses, channels_per_address) as pool:
+        await pool.wait_ready()
+        deadline = time.perf_counter() + duration
+        done = 0
+
+        async def worker() -> None:
+            nonlocal done
+            while time.perf_counter() < deadline:
+                await pool.ping("ping")
+                done += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    return done
+
+
+def _client_process(args: tuple[list[str], float, int, int]) -> int:
+    return asyncio.run(_drive(*args))
+
+
+def bench(
+    servers: int,
+    base_port: int,
+    duration: float,
+    concurrency: int,
+    client_processes: int,
+    channels_per_address: int,
+) -> float:
+    # grpc плохо переживает fork, поэтому и серверы, и клиенты стартуют через spawn
+    ctx = multiprocessing.get_context("spawn")
+    addresses = [f"localhost:{base_port + i}" for i in range(servers)]
+
+    processes = [
+        ctx.Process(target=serve, args=(f"[::]:{base_port + i}",), daemon=True)
+        for i in range(servers)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        with ctx.Pool(client_processes) as pool:
+            args = (addresses, duration, concurrency, channels_per_address)
+            total = sum(pool.map(_client_process, [args] * client_processes))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+
+    return total / duration
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Throughput of ExampleClientPool against N ExampleService processes"
+    )
+    parser.add_argument("--servers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--base-port", type=int, default=50100)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=32, help="per client process")
+    parser.add_argument("--client-processes", type=int, default=4)
+    parser.add_argument("--channels-per-address", type=int, default=2)
+    args = parser.parse_args()
+
+    baseline = None
+    for servers in args.servers:
+        rps = bench(
+            servers,
+            args.base_port,
+            args.duration,
+            args.concurrency,
+            args.client_processes,
+            args.channels_per_address,
+        )
+        baseline = baseline or rps / servers
+        print(
+            f"servers={servers}: {rps:,.0f} req/s "
+            f"(x{rps / baseline:.2f}, ideal x{servers})"
+        )
+
+
+if __name__ == "__main__":
+    main()
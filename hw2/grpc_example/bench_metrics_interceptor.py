@@ -0,0 +1,108 @@
+import argparse
+import statistics
+import time
+from collections import namedtuple
+from concurrent import futures
+
+import grpc
+from prometheus_client import CollectorRegistry
+
+import hw2.grpc_example.ping_pb2 as pb2
+import hw2.grpc_example.ping_pb2_grpc as pb2_grpc
+from hw2.grpc_example.example_service import ExampleService
+from hw2.grpc_example.metrics_interceptor import MetricsInterceptor
+
+_CallDetails = namedtuple("_CallDetails", ["method", "invocation_metadata"])
+
+
+class _FakeContext:
+    def code(self) -> None:
+        return None
+
+
+def _start_server(port: int, interceptors: list[grpc.ServerInterceptor]) -> grpc.Server:
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=10),
+        interceptors=interceptors,
+    )
+    pb2_grpc.add_ExampleServicer_to_server(ExampleService(), server)
+    server.add_insecure_port(f"localhost:{port}")
+    server.start()
+    return server
+
+
+def _ping_latencies(port: int, calls: int) -> list[float]:
+    request = pb2.PingRequest(message="ping")
+    latencies = []
+
+    with grpc.insecure_channel(f"localhost:{port}") as channel:
+        stub = pb2_grpc.ExampleStub(channel)
+        for _ in range(calls // 10):  # прогрев
+            stub.Ping(request)
+
+        for _ in range(calls):
+            start = time.perf_counter()
+            stub.Ping(request)
+            latencies.append(time.perf_counter() - start)
+
+    return latencies
+
+
+def bench_handler(calls: int) -> tuple[float, float]:
+    """Стоимость самой обертки без сети: прямой вызов хендлера Ping"""
+    service = ExampleService()
+    handler = grpc.unary_unary_rpc_method_handler(service.Ping)
+    interceptor = MetricsInterceptor(registry=CollectorRegistry())
+    wrapped = interceptor.intercept_service(
+        lambda _: handler,
+        _CallDetails("/example.Example/Ping", ()),
+    )
+
+    request = pb2.PingRequest(message="ping")
+    context = _FakeContext()
+    results = []
+
+    for behavior in (handler.unary_unary, wrapped.unary_unary):
+        start = time.perf_counter()
+        for _ in range(calls):
+            behavior(request, context)
+        results.append((time.perf_counter() - start) / calls)
+
+    return results[0], results[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="MetricsInterceptor overhead on Ping")
+    parser.add_argument("--calls", type=int, default=20_000)
+    parser.add_argument("--base-port", type=int, default=50200)
+    args = parser.parse_args()
+
+    plain, wrapped = bench_handler(args.calls * 10)
+    print(
+        f"handler: plain={plain * 1e6:.2f}us instrumented={wrapped * 1e6:.2f}us "
+        f"overhead={(wrapped - plain) * 1e6:.2f}us/call"
+    )
+
+    servers = {
+        "plain": _start_server(args.base_port, []),
+        "instrumented": _start_server(
+            args.base_port + 1,
+            [MetricsInterceptor(registry=CollectorRegistry())],
+        ),
+    }
+
+    try:
+        for port, name in enumerate(servers, start=args.base_port):
+            latencies = _ping_latencies(port, args.calls)
+            quantiles = statistics.quantiles(latencies, n=100)
+            print(
+                f"{name:>12}: mean={statistics.fmean(latencies) * 1e6:.1f}us "
+                f"p50={quantiles[49] * 1e6:.1f}us p99={quantiles[98] * 1e6:.1f}us"
+            )
+    finally:
+        for server in servers.values():
+            server.stop(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import asyncio
+import itertools
+import random
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Self
+
+import grpc
+
+import hw2.grpc_example.ping_pb2 as pb2
+import hw2.grpc_example.ping_pb2_grpc as pb2_grpc
+
+
+@dataclass(slots=True, frozen=True)
+class ChannelOptions:
+    keepalive_time_ms: int = 10_000
+    keepalive_timeout_ms: int = 5_000
+    keepalive_permit_without_calls: bool = True
+    max_pings_without_data: int = 0
+
+    def as_grpc_options(self) -> list[tuple[str, Any]]:
+        return [
+            ("grpc.keepalive_time_ms", self.keepalive_time_ms),
+            ("grpc.keepalive_timeout_ms", self.keepalive_timeout_ms),
+            (
+                "grpc.keepalive_permit_without_calls",
+                int(self.keepalive_permit_without_calls),
+            ),
+            ("grpc.http2.max_pings_without_data", self.max_pings_without_data),
+            # без этого каналы с одинаковыми аргументами делят одно
+            # HTTP/2 соединение из глобального пула сабканалов
+            ("grpc.use_local_subchannel_pool", 1),
+        ]
+
+
+@dataclass(slots=True, frozen=True)
+class RetryPolicy:
+    max_attempts: int = 3
+    initial_backoff: float = 0.05
+    max_backoff: float = 1.0
+    multiplier: float = 2.0
+    retryable_codes: frozenset[grpc.StatusCode] = frozenset(
+        {grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.RESOURCE_EXHAUSTED}
+    )
+
+    def backoff(self, attempt: int) -> float:
+        # full jitter, чтобы клиенты не ретраили синхронно
+        cap = min(self.max_backoff, self.initial_backoff * self.multiplier**attempt)
+        return random.uniform(0, cap)
+
+
+class ExampleClientPool:
+    """Пул каналов к одному или нескольким инстансам Example.
+
+    На каждый адрес открывается `channels_per_address` отдельных HTTP/2
+    соединений, вызовы раскидываются по ним round-robin. Unary вызовы
+    ретраятся с экспоненциальным backoff на следующем канале, стримы
+    привязываются к одному каналу и не ретраятся. `timeout` - дедлайн
+    каждого вызова, для стрима - на весь стрим целиком.
+    """
+
+    def __init__(
+        self,
+        addresses: Iterable[str],
+        channels_per_address: int = 1,
+        timeout: float | None = 1.0,
+        channel_options: ChannelOptions = ChannelOptions(),
+        retry_policy: RetryPolicy = RetryPolicy(),
+    ):
+        options = channel_options.as_grpc_options()
+
+        self._channels = [
+            grpc.aio.insecure_channel(address, options=options)
+            for address in addresses
+            for _ in range(channels_per_address)
+        ]
+        if not self._channels:
+            raise ValueError("At least one address is required")
+
+        self._stubs = itertools.cycle(
+            [pb2_grpc.ExampleStub(channel) for channel in self._channels]
+        )
+        self._timeout = timeout
+        self._retry_policy = retry_policy
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.close()
+
+    async def wait_ready(self) -> None:
+        await asyncio.gather(*(channel.channel_ready() for channel in self._channels))
+
+    async def close(self) -> None:
+        await asyncio.gather(*(channel.close() for channel in self._channels))
+
+    async def ping(self, message: str) -> str:
+        request = pb2.PingRequest(message=message)
+        response = await self._call_with_retry(lambda stub: stub.Ping, request)
+        return response.message
+
+    async def ping_batch(self, messages: Iterable[str]) -> list[str]:
+        request = pb2.PingBatchRequest(
+            messages=[pb2.PingRequest(message=m) for m in messages]
+        )
+        response = await self._call_with_retry(lambda stub: stub.PingBatch, request)
+        return [m.message for m in response.messages]
+
+    async def ping_stream(self, messages: AsyncIterable[str]) -> AsyncIterator[str]:
+        async def requests() -> AsyncIterator[pb2.PingRequest]:
+            async for message in messages:
+                yield pb2.PingRequest(message=message)
+
+        call = next(self._stubs).PingStream(requests(), timeout=self._timeout)
+        async for response in call:
+            yield response.message
+
+    async def _call_with_retry(self, method, request):
+        policy = self._retry_policy
+
+        for attempt in range(policy.max_attempts):
+            try:
+                return await method(next(self._stubs))(request, timeout=self._timeout)
+            except grpc.aio.AioRpcError as e:
+                if (
+                    e.code() not in policy.retryable_codes
+                    or attempt == policy.max_attempts - 1
+                ):
+                    raise
+
+            await asyncio.sleep(policy.backoff(attempt))
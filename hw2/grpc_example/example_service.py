@@ -2,9 +2,14 @@ from concurrent import futures
 from typing import Iterable
 
 import grpc
+from prometheus_client import start_http_server
 
 import hw2.grpc_example.ping_pb2 as pb2
 import hw2.grpc_example.ping_pb2_grpc as pb2_grpc
+from hw2.grpc_example.metrics_interceptor import (
+    MetricsInterceptor,
+    register_executor_metrics,
+)
 
 
 class ExampleService(pb2_grpc.ExampleServicer):
@@ -15,11 +20,32 @@ class ExampleService(pb2_grpc.ExampleServicer):
         for message in request_iterator:
             yield pb2.PongResponse(message=message.message)
 
+    def PingBatch(self, request: pb2.PingBatchRequest, context):
+        return pb2.PongBatchResponse(
+            messages=[pb2.PongResponse(message=m.message) for m in request.messages]
+        )
 
-if __name__ == "__main__":
-    print("running server")
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+
+def serve(
+    address: str = "[::]:50051",
+    max_workers: int = 10,
+    metrics_port: int | None = None,
+) -> None:
+    executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+    interceptors = []
+
+    if metrics_port is not None:
+        interceptors.append(MetricsInterceptor())
+        register_executor_metrics(executor)
+        start_http_server(metrics_port)
+
+    server = grpc.server(executor, interceptors=interceptors)
     pb2_grpc.add_ExampleServicer_to_server(ExampleService(), server)
-    server.add_insecure_port("[::]:50051")
+    server.add_insecure_port(address)
     server.start()
     server.wait_for_termination()
+
+
+if __name__ == "__main__":
+    print("running server, metrics on :9101/metrics")
+    serve(metrics_port=9101)
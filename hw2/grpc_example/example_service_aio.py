@@ -0,0 +1,42 @@
+import asyncio
+from typing import AsyncIterable
+
+import grpc
+
+import hw2.grpc_example.ping_pb2 as pb2
+import hw2.grpc_example.ping_pb2_grpc as pb2_grpc
+
+
+class AsyncExampleService(pb2_grpc.ExampleServicer):
+    """Тот же Example, но на grpc.aio: стримы живут в event loop, а не занимают
+    по потоку из пула, так что число одновременных RPC не ограничено max_workers"""
+
+    async def Ping(self, request: pb2.PingRequest, context):
+        return pb2.PongResponse(message=request.message)
+
+    async def PingStream(
+        self,
+        request_iterator: AsyncIterable[pb2.PingRequest],
+        context,
+    ):
+        async for message in request_iterator:
+            yield pb2.PongResponse(message=message.message)
+
+    async def PingBatch(self, request: pb2.PingBatchRequest, context):
+        return pb2.PongBatchResponse(
+            messages=[pb2.PongResponse(message=m.message) for m in request.messages]
+        )
+
+
+async def serve(address: str = "[::]:50051") -> None:
+    server = grpc.aio.server()
+    pb2_grpc.add_ExampleServicer_to_server(AsyncExampleService(), server)
+    server.add_insecure_port(address)
+
+    await server.start()
+    await server.wait_for_termination()
+
+
+if __name__ == "__main__":
+    print("running aio server")
+    asyncio.run(serve())
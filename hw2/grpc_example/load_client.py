@@ -0,0 +1,201 @@
+import argparse
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import grpc
+
+import hw2.grpc_example.ping_pb2 as pb2
+import hw2.grpc_example.ping_pb2_grpc as pb2_grpc
+
+MODES = ("unary", "stream", "batch")
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+@dataclass(slots=True)
+class Report:
+    mode: str
+    messages: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+    # для unary и stream - задержка одного сообщения, для batch - одного вызова
+    latencies: list[float] = field(default_factory=list)
+
+    @property
+    def throughput(self) -> float:
+        return self.messages / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def render(self) -> str:
+        percentiles = " ".join(
+            f"p{p:g}={self.percentile(p) * 1000:.3f}ms" for p in PERCENTILES
+        )
+        return (
+            f"{self.mode:>6}: {self.throughput:,.0f} msg/s "
+            f"({self.messages} messages, {self.errors} errors, {self.elapsed:.1f}s) "
+            f"{percentiles}"
+        )
+
+
+async def _unary_worker(
+    stub: pb2_grpc.ExampleStub,
+    report: Report,
+    deadline: float,
+    request: pb2.PingRequest,
+) -> None:
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+
+        try:
+            await stub.Ping(request)
+        except grpc.aio.AioRpcError:
+            report.errors += 1
+            continue
+
+        report.latencies.append(time.perf_counter() - start)
+        report.messages += 1
+
+
+async def _stream_worker(
+    stub: pb2_grpc.ExampleStub,
+    report: Report,
+    deadline: float,
+    request: pb2.PingRequest,
+    window: int,
+) -> None:
+    # сервер отвечает строго по порядку, поэтому время отправки можно
+    # хранить в очереди и снимать с головы при каждом ответе
+    call = stub.PingStream()
+    sent_at = deque[float]()
+    in_flight = asyncio.Semaphore(window)
+
+    async def write() -> None:
+        while time.perf_counter() < deadline:
+            await in_flight.acquire()
+            sent_at.append(time.perf_counter())
+            await call.write(request)
+
+        await call.done_writing()
+
+    writer = asyncio.create_task(write())
+
+    try:
+        while await call.read() is not grpc.aio.EOF:
+            report.latencies.append(time.perf_counter() - sent_at.popleft())
+            report.messages += 1
+            in_flight.release()
+    except grpc.aio.AioRpcError:
+        report.errors += 1
+        writer.cancel()
+
+    await asyncio.gather(writer, return_exceptions=True)
+
+
+async def _batch_worker(
+    stub: pb2_grpc.ExampleStub,
+    report: Report,
+    deadline: float,
+    request: pb2.PingRequest,
+    batch_size: int,
+) -> None:
+    batch = pb2.PingBatchRequest(messages=[request] * batch_size)
+
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+
+        try:
+            response = await stub.PingBatch(batch)
+        except grpc.aio.AioRpcError:
+            report.errors += 1
+            continue
+
+        report.latencies.append(time.perf_counter() - start)
+        report.messages += len(response.messages)
+
+
+async def run(
+    target: str,
+    mode: str,
+    duration: float,
+    concurrency: int,
+    batch_size: int,
+    window: int,
+    payload: str,
+) -> Report:
+    report = Report(mode)
+    request = pb2.PingRequest(message=payload)
+
+    async with grpc.aio.insecure_channel(target) as channel:
+        stub = pb2_grpc.ExampleStub(channel)
+        await channel.channel_ready()
+
+        start = time.perf_counter()
+        deadline = start + duration
+
+        match mode:
+            case "unary":
+                workers = [
+                    _unary_worker(stub, report, deadline, request)
+                    for _ in range(concurrency)
+                ]
+            case "stream":
+                workers = [
+                    _stream_worker(stub, report, deadline, request, window)
+                    for _ in range(concurrency)
+                ]
+            case "batch":
+                workers = [
+                    _batch_worker(stub, report, deadline, request, batch_size)
+                    for _ in range(concurrency)
+                ]
+            case _:
+                raise ValueError(f"Unknown mode {mode}")
+
+        await asyncio.gather(*workers)
+        report.elapsed = time.perf_counter() - start
+
+    return report
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load generator for Example service")
+    parser.add_argument("--target", default="localhost:50051")
+    parser.add_argument("--mode", choices=MODES, nargs="+", default=list(MODES))
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per mode")
+    parser.add_argument("--concurrency", type=int, default=50, help="calls or streams")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=100,
+        help="max in-flight messages per stream",
+    )
+    parser.add_argument("--payload", default="ping")
+    return parser.parse_args()
+
+
+async def main() -> None:
+    args = _parse_args()
+
+    for mode in args.mode:
+        report = await run(
+            args.target,
+            mode,
+            args.duration,
+            args.concurrency,
+            args.batch_size,
+            args.window,
+            args.payload,
+        )
+        print(report.render())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,233 @@
+import time
+from concurrent import futures
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator
+
+import grpc
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram
+
+# Echo-ручки отвечают за десятки микросекунд, стандартные бакеты prometheus
+# (от 5ms) сваливают их все в первый
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+
+@dataclass(slots=True)
+class _MethodMetrics:
+    latency: Histogram
+    received: Counter
+    sent: Counter
+    in_flight: Gauge
+    handled: dict[grpc.StatusCode, Counter]
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """Метрики для синхронного grpc сервера в формате Prometheus.
+
+    Пишет гистограмму длительности, счетчики сообщений в обе стороны,
+    число RPC в работе и итоговые статус-коды по каждому методу. Метки
+    берутся только из зарегистрированных методов, так что кардинальность
+    ограничена схемой сервиса. По имени метода кэшируются только дочерние
+    метрики с метками, хендлер же на каждый вызов берется из `continuation`:
+    интерцепторы после этого (например, авторизация) должны видеть каждый RPC.
+    """
+
+    def __init__(
+        self,
+        registry: CollectorRegistry = REGISTRY,
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ):
+        self._latency = Histogram(
+            "grpc_server_handling_seconds",
+            "Time spent handling RPC, including the whole stream",
+            ["grpc_method"],
+            buckets=tuple(buckets),
+            registry=registry,
+        )
+        self._received = Counter(
+            "grpc_server_msg_received",
+            "Messages received from clients",
+            ["grpc_method"],
+            registry=registry,
+        )
+        self._sent = Counter(
+            "grpc_server_msg_sent",
+            "Messages sent to clients",
+            ["grpc_method"],
+            registry=registry,
+        )
+        self._in_flight = Gauge(
+            "grpc_server_in_flight",
+            "RPCs currently being handled",
+            ["grpc_method"],
+            registry=registry,
+        )
+        self._handled = Counter(
+            "grpc_server_handled",
+            "Completed RPCs by status code",
+            ["grpc_method", "grpc_code"],
+            registry=registry,
+        )
+        self._metrics: dict[str, _MethodMetrics] = {}
+
+    def intercept_service(
+        self,
+        continuation: Callable[[grpc.HandlerCallDetails], grpc.RpcMethodHandler],
+        handler_call_details: grpc.HandlerCallDetails,
+    ) -> grpc.RpcMethodHandler | None:
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+
+        method = handler_call_details.method
+        if (metrics := self._metrics.get(method)) is None:
+            metrics = self._metrics[method] = _MethodMetrics(
+                latency=self._latency.labels(method),
+                received=self._received.labels(method),
+                sent=self._sent.labels(method),
+                in_flight=self._in_flight.labels(method),
+                handled={},
+            )
+
+        if handler.unary_unary:
+            return handler._replace(
+                unary_unary=self._wrap_unary(handler.unary_unary, method, metrics)
+            )
+        if handler.stream_unary:
+            return handler._replace(
+                stream_unary=self._wrap_unary(handler.stream_unary, method, metrics)
+            )
+        if handler.unary_stream:
+            return handler._replace(
+                unary_stream=self._wrap_stream(handler.unary_stream, method, metrics)
+            )
+        return handler._replace(
+            stream_stream=self._wrap_stream(handler.stream_stream, method, metrics)
+        )
+
+    def _wrap_unary(self, behavior, method: str, metrics: _MethodMetrics):
+        def wrapper(request: Any, context: grpc.ServicerContext) -> Any:
+            request = _count_requests(request, metrics.received)
+            metrics.in_flight.inc()
+            start = time.perf_counter()
+            code = grpc.StatusCode.UNKNOWN
+
+            try:
+                response = behavior(request, context)
+                code = context.code() or grpc.StatusCode.OK
+                metrics.sent.inc()
+                return response
+            except Exception:
+                code = _failure_code(context)
+                raise
+            finally:
+                metrics.latency.observe(time.perf_counter() - start)
+                metrics.in_flight.dec()
+                self._count_handled(method, metrics, code)
+
+        return wrapper
+
+    def _wrap_stream(self, behavior, method: str, metrics: _MethodMetrics):
+        def wrapper(request: Any, context: grpc.ServicerContext) -> Iterator[Any]:
+            request = _count_requests(request, metrics.received)
+            metrics.in_flight.inc()
+            start = time.perf_counter()
+            code = grpc.StatusCode.UNKNOWN
+
+            try:
+                for response in behavior(request, context):
+                    metrics.sent.inc()
+                    yield response
+                code = context.code() or grpc.StatusCode.OK
+            except GeneratorExit:
+                code = grpc.StatusCode.CANCELLED
+                raise
+            except Exception:
+                code = _failure_code(context)
+                raise
+            finally:
+                metrics.latency.observe(time.perf_counter() - start)
+                metrics.in_flight.dec()
+                self._count_handled(method, metrics, code)
+
+        return wrapper
+
+    def _count_handled(
+        self,
+        method: str,
+        metrics: _MethodMetrics,
+        code: grpc.StatusCode,
+    ) -> None:
+        if (counter := metrics.handled.get(code)) is None:
+            counter = metrics.handled[code] = self._handled.labels(method, code.name)
+
+        counter.inc()
+
+
+def _failure_code(context: grpc.ServicerContext) -> grpc.StatusCode:
+    """Статус RPC, завершившегося исключением.
+
+    Когда клиент отменяет стрим, итератор запросов бросает RpcError, а код
+    в контексте не выставлен - без проверки is_active это был бы UNKNOWN.
+    """
+    if code := context.code():
+        return code
+    if context.is_active():
+        return grpc.StatusCode.UNKNOWN
+    if (remaining := context.time_remaining()) is not None and remaining <= 0:
+        return grpc.StatusCode.DEADLINE_EXCEEDED
+    return grpc.StatusCode.CANCELLED
+
+
+def _count_requests(request: Any, received: Counter) -> Any:
+    if not isinstance(request, Iterator):
+        received.inc()
+        return request
+
+    def counted() -> Iterator[Any]:
+        for message in request:
+            received.inc()
+            yield message
+
+    return counted()
+
+
+def register_executor_metrics(
+    executor: futures.ThreadPoolExecutor,
+    registry: CollectorRegistry = REGISTRY,
+) -> None:
+    """Насыщение пула потоков синхронного сервера.
+
+    Когда все `max_workers` заняты (например, открытыми стримами), новые RPC
+    копятся в очереди пула - это и видно по `grpc_server_executor_queue_size`.
+    """
+    # у ThreadPoolExecutor нет публичного API для очереди и потоков
+    Gauge(
+        "grpc_server_executor_queue_size",
+        "RPCs waiting for a free worker thread",
+        registry=registry,
+    ).set_function(lambda: executor._work_queue.qsize())
+    Gauge(
+        "grpc_server_executor_threads",
+        "Worker threads started by the executor",
+        registry=registry,
+    ).set_function(lambda: len(executor._threads))
+    Gauge(
+        "grpc_server_executor_max_workers",
+        "Executor size",
+        registry=registry,
+    ).set(executor._max_workers)
@@ -0,0 +1,35 @@
+import asyncio
+
+import grpc
+import pytest
+
+# код из ping.proto генерируется командой из README и в репозиторий не входит
+pb2_grpc = pytest.importorskip("hw2.grpc_example.ping_pb2_grpc")
+
+from hw2.grpc_example.client_pool import ExampleClientPool  # noqa: E402
+from hw2.grpc_example.example_service_aio import AsyncExampleService  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_ping_stream_respects_timeout() -> None:
+    server = grpc.aio.server()
+    pb2_grpc.add_ExampleServicer_to_server(AsyncExampleService(), server)
+    port = server.add_insecure_port("localhost:0")
+    await server.start()
+
+    async def messages():
+        yield "ping"
+        await asyncio.sleep(10)  # стрим висит без новых сообщений
+
+    try:
+        async with ExampleClientPool([f"localhost:{port}"], timeout=0.2) as pool:
+            received = []
+            with pytest.raises(grpc.aio.AioRpcError) as error:
+                async with asyncio.timeout(5):
+                    async for message in pool.ping_stream(messages()):
+                        received.append(message)
+
+            assert received == ["ping"]
+            assert error.value.code() == grpc.StatusCode.DEADLINE_EXCEEDED
+    finally:
+        await server.stop(None)
@@ -0,0 +1,87 @@
+import threading
+import time
+from concurrent import futures
+
+import grpc
+import pytest
+from prometheus_client import CollectorRegistry
+
+# код из ping.proto генерируется командой из README и в репозиторий не входит
+pb2 = pytest.importorskip("hw2.grpc_example.ping_pb2")
+pb2_grpc = pytest.importorskip("hw2.grpc_example.ping_pb2_grpc")
+
+from hw2.grpc_example.example_service import ExampleService  # noqa: E402
+from hw2.grpc_example.metrics_interceptor import MetricsInterceptor  # noqa: E402
+
+TOKEN = "secret"
+
+
+class _AuthInterceptor(grpc.ServerInterceptor):
+    def intercept_service(self, continuation, handler_call_details):
+        if ("token", TOKEN) in (handler_call_details.invocation_metadata or ()):
+            return continuation(handler_call_details)
+
+        def deny(request, context):
+            context.abort(grpc.StatusCode.UNAUTHENTICATED, "no token")
+
+        return grpc.unary_unary_rpc_method_handler(deny)
+
+
+@pytest.fixture()
+def registry() -> CollectorRegistry:
+    return CollectorRegistry()
+
+
+@pytest.fixture()
+def stub(registry):
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=4),
+        interceptors=[MetricsInterceptor(registry=registry), _AuthInterceptor()],
+    )
+    pb2_grpc.add_ExampleServicer_to_server(ExampleService(), server)
+    port = server.add_insecure_port("localhost:0")
+    server.start()
+
+    with grpc.insecure_channel(f"localhost:{port}") as channel:
+        yield pb2_grpc.ExampleStub(channel)
+
+    server.stop(None)
+
+
+def _handled(registry: CollectorRegistry, method: str, code: str) -> float:
+    value = registry.get_sample_value(
+        "grpc_server_handled_total", {"grpc_method": method, "grpc_code": code}
+    )
+    return value or 0.0
+
+
+def test_next_interceptor_runs_on_every_call(stub) -> None:
+    request = pb2.PingRequest(message="ping")
+
+    assert stub.Ping(request, metadata=[("token", TOKEN)]).message == "ping"
+
+    with pytest.raises(grpc.RpcError) as error:
+        stub.Ping(request)
+    assert error.value.code() == grpc.StatusCode.UNAUTHENTICATED
+
+
+def test_cancelled_stream_is_counted_as_cancelled(stub, registry) -> None:
+    method = "/example.Example/PingStream"
+
+    done = threading.Event()
+
+    def requests():
+        yield pb2.PingRequest(message="ping")
+        done.wait(5)  # клиент держит стрим открытым, пока его не отменят
+
+    call = stub.PingStream(requests(), metadata=[("token", TOKEN)])
+    assert next(call).message == "ping"
+    call.cancel()
+    done.set()
+
+    deadline = time.monotonic() + 5
+    while not _handled(registry, method, "CANCELLED") and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert _handled(registry, method, "CANCELLED") == 1
+    assert _handled(registry, method, "UNKNOWN") == 0
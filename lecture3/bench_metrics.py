@@ -0,0 +1,57 @@
+import argparse
+import time
+from unittest import mock
+
+from demo_service import metrics, store
+from demo_service.contracts import UserRequest
+
+
+class _NoopMetric:
+    def inc(self, value: float = 1) -> None:
+        pass
+
+
+def _workload(requests: list[UserRequest]) -> float:
+    store.clear()
+    start = time.perf_counter()
+
+    for request in requests:
+        store.insert(request)
+    for id in range(2 * len(requests)):  # половина промахов
+        store.select(id)
+
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Overhead of demo_service store metrics")
+    parser.add_argument("--users", type=int, default=100_000)
+    args = parser.parse_args()
+
+    requests = [
+        UserRequest(username=f"user{i}", first_name="First", last_name="Last")
+        for i in range(args.users)
+    ]
+    operations = 3 * args.users
+
+    _workload(requests)  # прогрев
+    instrumented = min(_workload(requests) for _ in range(3))
+
+    noop = _NoopMetric()
+    with mock.patch.multiple(
+        metrics,
+        SELECT_HITS=noop,
+        SELECT_MISSES=noop,
+    ):
+        plain = min(_workload(requests) for _ in range(3))
+
+    print(f"without metrics: {plain / operations * 1e6:.2f}us/op")
+    print(f"with metrics:    {instrumented / operations * 1e6:.2f}us/op")
+    print(
+        f"overhead:        {(instrumented - plain) / operations * 1e6:.2f}us/op "
+        f"({(instrumented / plain - 1) * 100:.0f}%)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import time
+from typing import Callable
+
+from demo_service import store
+from demo_service.contracts import UserRequest, UserResource
+
+
+def _insert_with_revalidate(users: dict[int, UserResource], id: int, user: UserRequest):
+    # прежняя реализация store.insert: model_dump + повторная валидация
+    users[id] = UserResource(uid=id, **user.model_dump())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="demo_service store insert throughput")
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    requests = [
+        UserRequest(username=f"user{i}", first_name="First", last_name="Last")
+        for i in range(args.users)
+    ]
+
+    def revalidate() -> float:
+        users = dict[int, UserResource]()
+        start = time.perf_counter()
+        for i, request in enumerate(requests):
+            _insert_with_revalidate(users, i, request)
+        return time.perf_counter() - start
+
+    def indexed() -> float:
+        store.clear()
+        start = time.perf_counter()
+        for request in requests:
+            store.insert(request)
+        return time.perf_counter() - start
+
+    def select() -> float:
+        start = time.perf_counter()
+        for request in requests:
+            store.select_by_username(request.username)
+        return time.perf_counter() - start
+
+    def best(run: Callable[[], float]) -> float:
+        # первый проход - прогрев, дальше лучший из --repeat: разница между
+        # реализациями сравнима с разбросом одиночных замеров
+        run()
+        return min(run() for _ in range(args.repeat))
+
+    before = best(revalidate)
+    after = best(indexed)
+    lookup = best(select)
+
+    print(f"insert, dump + revalidate: {args.users / before:,.0f} ops/s")
+    print(f"insert, indexed store:     {args.users / after:,.0f} ops/s")
+    print(f"select_by_username:        {args.users / lookup:,.0f} ops/s")
+
+
+if __name__ == "__main__":
+    main()
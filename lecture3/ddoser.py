@@ -1,44 +1,438 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from http import HTTPStatus
+from pathlib import Path
+from typing import Self
 
-import requests
+import httpx
 from faker import Faker
 
 faker = Faker()
 
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
 
-def create_users():
-    for _ in range(500):
-        user = faker.profile()
-        response = requests.post(
-            "http://localhost:8080/create-user",
-            json={
-                "username": user["username"],
-                "first_name": user["name"],
-                "last_name": "",
-            },
+
+class LatencyHistogram:
+    """Гистограмма задержек в духе HdrHistogram.
+
+    Значения хранятся в микросекундах в лог-линейных бакетах: внутри каждой
+    степени двойки `2**sub_bucket_bits` равных бакетов, так что относительная
+    ошибка не больше `2**-(sub_bucket_bits - 1)` на всем диапазоне. Память
+    зависит от разброса задержек, а не от числа запросов, гистограммы разных
+    прогонов можно складывать.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 10):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts: dict[int, int] = {}
+        self.total = 0
+
+    def _bucket(self, micros: int) -> int:
+        shift = max(0, micros.bit_length() - self.sub_bucket_bits)
+        return (shift << self.sub_bucket_bits) | (micros >> shift)
+
+    def _highest_equivalent(self, bucket: int) -> int:
+        shift = bucket >> self.sub_bucket_bits
+        mantissa = bucket & ((1 << self.sub_bucket_bits) - 1)
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, seconds: float) -> None:
+        bucket = self._bucket(max(0, int(seconds * 1_000_000)))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        if other.sub_bucket_bits != self.sub_bucket_bits:
+            raise ValueError("Histograms have different precision")
+
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+
+    def percentile(self, p: float) -> float:
+        """Верхняя граница бакета, в который попадает p-й перцентиль, в секундах"""
+        if not self.total:
+            return 0.0
+
+        target = max(1, math.ceil(self.total * p / 100))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                return self._highest_equivalent(bucket) / 1_000_000
+
+        return self.max()
+
+    def max(self) -> float:
+        if not self.counts:
+            return 0.0
+
+        return self._highest_equivalent(max(self.counts)) / 1_000_000
+
+    def to_dict(self) -> dict:
+        return {
+            "sub_bucket_bits": self.sub_bucket_bits,
+            "counts": {str(b): count for b, count in sorted(self.counts.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Self:
+        histogram = cls(data["sub_bucket_bits"])
+        for bucket, count in data["counts"].items():
+            histogram.counts[int(bucket)] = count
+            histogram.total += count
+
+        return histogram
+
+
+@dataclass(slots=True)
+class Scenario:
+    """Что и как отправлять в demo_service"""
+
+    base_url: str = "http://localhost:8080"
+    duration: float = 30.0
+    # доли запросов create-user, get-user и их пакетных вариантов
+    # create-users/get-users, нормируются при выборе
+    create_weight: float = 1.0
+    get_weight: float = 1.0
+    create_batch_weight: float = 0.0
+    get_batch_weight: float = 0.0
+    batch_size: int = 100
+    # closed - concurrency воркеров шлют следующий запрос после ответа,
+    # open - запросы стартуют пуассоновским потоком с частотой rps,
+    # fixed - запросы стартуют строго каждые 1/rps секунд
+    arrival: str = "closed"
+    rps: float | None = None
+    concurrency: int = 30
+    timeout: float = 5.0
+
+
+@dataclass(slots=True)
+class OperationStats:
+    # latency считается от запланированного момента старта, если у запроса
+    # есть расписание (задан rps), service_time - от фактической отправки.
+    # Разница между ними - очередь, которую закрытая модель без расписания
+    # не видит (coordinated omission)
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    service_time: LatencyHistogram = field(default_factory=LatencyHistogram)
+    statuses: dict[str, int] = field(default_factory=dict)
+
+    def record(self, status: str, latency: float, service_time: float) -> None:
+        self.latency.record(latency)
+        self.service_time.record(service_time)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def merge(self, other: "OperationStats") -> None:
+        self.latency.merge(other.latency)
+        self.service_time.merge(other.service_time)
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+
+    def summary(self, elapsed: float) -> dict:
+        def percentiles(histogram: LatencyHistogram) -> dict[str, float]:
+            result = {f"p{p:g}": histogram.percentile(p) * 1000 for p in PERCENTILES}
+            result["max"] = histogram.max() * 1000
+            return result
+
+        return {
+            "requests": self.latency.total,
+            "throughput": self.latency.total / elapsed if elapsed else 0.0,
+            "statuses": self.statuses,
+            "latency_ms": percentiles(self.latency),
+            "service_time_ms": percentiles(self.service_time),
+            "histogram": self.latency.to_dict(),
+        }
+
+
+class LoadRunner:
+    def __init__(self, scenario: Scenario):
+        self.scenario = scenario
+        self.operations = [
+            (name, operation, weight)
+            for name, operation, weight in [
+                ("create-user", self.create_user, scenario.create_weight),
+                ("get-user", self.get_user, scenario.get_weight),
+                ("create-users", self.create_users, scenario.create_batch_weight),
+                ("get-users", self.get_users, scenario.get_batch_weight),
+            ]
+            if weight > 0
+        ]
+        self.stats = {name: OperationStats() for name, _, _ in self.operations}
+        self._known_ids: list[int] = []
+        self._client = httpx.AsyncClient(
+            base_url=scenario.base_url,
+            timeout=scenario.timeout,
+            # соединения переиспользуются, пул по числу одновременных запросов
+            limits=httpx.Limits(
+                max_connections=scenario.concurrency,
+                max_keepalive_connections=scenario.concurrency,
+            ),
+        )
+
+    @staticmethod
+    def _fake_user() -> dict:
+        return {
+            "username": faker.user_name(),
+            "first_name": faker.name(),
+            "last_name": "",
+        }
+
+    def _random_id(self) -> int:
+        if self._known_ids:
+            return random.choice(self._known_ids)
+
+        return faker.random_number(digits=2)
+
+    async def create_user(self) -> httpx.Response:
+        response = await self._client.post("/create-user", json=self._fake_user())
+
+        if response.status_code == HTTPStatus.CREATED:
+            self._known_ids.append(response.json()["uid"])
+
+        return response
+
+    async def get_user(self) -> httpx.Response:
+        return await self._client.post("/get-user", params={"id": self._random_id()})
+
+    async def create_users(self) -> httpx.Response:
+        response = await self._client.post(
+            "/create-users",
+            json=[self._fake_user() for _ in range(self.scenario.batch_size)],
+        )
+
+        if response.status_code == HTTPStatus.OK:
+            self._known_ids.extend(
+                item["user"]["uid"]
+                for item in response.json()
+                if item["status"] == HTTPStatus.CREATED
+            )
+
+        return response
+
+    async def get_users(self) -> httpx.Response:
+        return await self._client.post(
+            "/get-users",
+            json=[self._random_id() for _ in range(self.scenario.batch_size)],
+        )
+
+    async def one_request(self, intended_start: float | None = None) -> None:
+        name, operation, _ = random.choices(
+            self.operations,
+            weights=[weight for _, _, weight in self.operations],
+        )[0]
+
+        start = time.perf_counter()
+        try:
+            status = str((await operation()).status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        end = time.perf_counter()
+
+        self.stats[name].record(
+            status,
+            end - (start if intended_start is None else intended_start),
+            end - start,
         )
 
-        print(response)
+    async def run_closed(self, deadline: float) -> None:
+        # при заданном rps каждый воркер держит свою долю темпа, отстающий
+        # воркер не сдвигает расписание, а копит задержку в latency
+        interval = (
+            self.scenario.concurrency / self.scenario.rps if self.scenario.rps else 0.0
+        )
+
+        async def worker() -> None:
+            next_start = time.perf_counter()
+            while (now := time.perf_counter()) < deadline:
+                if next_start > now:
+                    await asyncio.sleep(next_start - now)
+
+                await self.one_request(next_start if interval else None)
+                next_start += interval
+
+        await asyncio.gather(*(worker() for _ in range(self.scenario.concurrency)))
+
+    async def run_scheduled(self, deadline: float) -> None:
+        if not self.scenario.rps:
+            raise ValueError(f"{self.scenario.arrival} arrival requires rps")
+
+        # запросы запускаются по расписанию независимо от ответов, если цикл
+        # отстал, пропущенные запросы стартуют сразу, а не выкидываются
+        in_flight = set[asyncio.Task]()
+        next_start = time.perf_counter()
+
+        while next_start < deadline:
+            if (delay := next_start - time.perf_counter()) > 0:
+                await asyncio.sleep(delay)
+
+            task = asyncio.create_task(self.one_request(next_start))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+            if self.scenario.arrival == "fixed":
+                next_start += 1 / self.scenario.rps
+            else:
+                next_start += random.expovariate(self.scenario.rps)
+
+        await asyncio.gather(*in_flight)
+
+    async def run(self) -> dict:
+        start = time.perf_counter()
+        deadline = start + self.scenario.duration
+
+        try:
+            if self.scenario.arrival == "closed":
+                await self.run_closed(deadline)
+            else:
+                await self.run_scheduled(deadline)
+        finally:
+            await self._client.aclose()
+
+        elapsed = time.perf_counter() - start
+        total = OperationStats()
+        for stats in self.stats.values():
+            total.merge(stats)
+
+        return {
+            "scenario": asdict(self.scenario),
+            "elapsed": elapsed,
+            "total": total.summary(elapsed),
+            "operations": {
+                name: stats.summary(elapsed) for name, stats in self.stats.items()
+            },
+        }
 
 
-def get_users():
-    for _ in range(500):
+def render(results: dict) -> str:
+    lines = [f"elapsed {results['elapsed']:.1f}s"]
 
-        response = requests.post(
-            "http://localhost:8080/get-user",
-            params={"id": faker.random_number(digits=2)},
+    for name, summary in [("total", results["total"]), *results["operations"].items()]:
+        latency = " ".join(f"{k}={v:.2f}ms" for k, v in summary["latency_ms"].items())
+        lines.append(
+            f"{name:>12}: {summary['requests']} requests, "
+            f"{summary['throughput']:,.1f} req/s, {latency}, "
+            f"statuses {summary['statuses']}"
         )
-        print(response)
 
+    return "\n".join(lines)
 
-with ThreadPoolExecutor() as executor:
-    futures = {}
 
-    for i in range(15):
-        futures[executor.submit(create_users)] = f"create-user-{i}"
+def compare(base: dict, new: dict, threshold: float) -> tuple[list[str], bool]:
+    """Построчный дифф двух прогонов.
+
+    Регрессия - рост любого перцентиля задержки или падение пропускной
+    способности больше чем на `threshold` процентов.
+    """
+    lines = []
+    regressed = False
+
+    sections = [("total", base["total"], new["total"])] + [
+        (name, summary, new["operations"][name])
+        for name, summary in base["operations"].items()
+        if name in new["operations"]
+    ]
+
+    for name, old_summary, new_summary in sections:
+        # direction: -1 - хуже, когда метрика падает, 1 - когда растет
+        metrics = [
+            ("throughput", old_summary["throughput"], new_summary["throughput"], -1)
+        ]
+        metrics += [
+            (f"latency {key}", value, new_summary["latency_ms"][key], 1)
+            for key, value in old_summary["latency_ms"].items()
+        ]
+
+        for metric, old, current, direction in metrics:
+            change = (current - old) / old * 100 if old else 0.0
+            is_regression = change * direction > threshold
+            regressed |= is_regression
+
+            lines.append(
+                f"{name:>12} {metric:<16} {old:>12.2f} -> {current:>12.2f} "
+                f"({change:+.1f}%){'  REGRESSION' if is_regression else ''}"
+            )
+
+    return lines, regressed
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Async load generator for demo_service")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="generate load and report latency")
+    defaults = Scenario()
+    run.add_argument("--base-url", default=defaults.base_url)
+    run.add_argument("--duration", type=float, default=defaults.duration)
+    run.add_argument("--create-weight", type=float, default=defaults.create_weight)
+    run.add_argument("--get-weight", type=float, default=defaults.get_weight)
+    run.add_argument(
+        "--create-batch-weight",
+        type=float,
+        default=defaults.create_batch_weight,
+    )
+    run.add_argument("--get-batch-weight", type=float, default=defaults.get_batch_weight)
+    run.add_argument("--batch-size", type=int, default=defaults.batch_size)
+    run.add_argument("--arrival", choices=["closed", "open", "fixed"], default="closed")
+    run.add_argument("--rps", type=float, default=None, help="target requests/sec")
+    run.add_argument("--concurrency", type=int, default=defaults.concurrency)
+    run.add_argument("--timeout", type=float, default=defaults.timeout)
+    run.add_argument("--out", type=Path, default=None, help="JSON results file")
+
+    diff = commands.add_parser("compare", help="diff two JSON results files")
+    diff.add_argument("base", type=Path)
+    diff.add_argument("new", type=Path)
+    diff.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="regression threshold, percent",
+    )
+
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace) -> None:
+    scenario = Scenario(
+        base_url=args.base_url,
+        duration=args.duration,
+        create_weight=args.create_weight,
+        get_weight=args.get_weight,
+        create_batch_weight=args.create_batch_weight,
+        get_batch_weight=args.get_batch_weight,
+        batch_size=args.batch_size,
+        arrival=args.arrival,
+        rps=args.rps,
+        concurrency=args.concurrency,
+        timeout=args.timeout,
+    )
+
+    results = await LoadRunner(scenario).run()
+    print(render(results))
+
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2))
+
+
+def main() -> None:
+    args = _parse_args()
+
+    if args.command == "compare":
+        lines, regressed = compare(
+            json.loads(args.base.read_text()),
+            json.loads(args.new.read_text()),
+            args.threshold,
+        )
+        print("\n".join(lines))
+        sys.exit(1 if regressed else 0)
+
+    asyncio.run(run(args))
 
-    for _ in range(15):
-        futures[executor.submit(get_users)] = f"get-users-{i}"
 
-    for future in as_completed(futures):
-        print(f"completed {futures[future]}")
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,89 @@
+from contextlib import asynccontextmanager
+from dataclasses import asdict
 from http import HTTPStatus
 from typing import Annotated
+import os
 import random
 
-from fastapi import FastAPI, HTTPException, Query
-from prometheus_fastapi_instrumentator import Instrumentator
+from fastapi import APIRouter, Body, FastAPI, HTTPException, Query, Request
+from fastapi.exception_handlers import http_exception_handler
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from demo_service import store
-from demo_service.contracts import UserRequest, UserResource
+from demo_service import metrics, store
+from demo_service.contracts import UserRequest, UserResource, UserResult
+from demo_service.profiling import LoopLagMonitor, Profiler
 
-app = FastAPI(title="Demo User API")
-Instrumentator().instrument(app).expose(app)
+# админские ручки профилирования выключены, пока их явно не включили
+ADMIN_ENABLED = os.environ.get("DEMO_ADMIN_ENABLED", "") == "1"
+SLOW_CALLBACK_THRESHOLD = float(os.environ.get("DEMO_SLOW_CALLBACK_THRESHOLD", "0.1"))
+# больше элементов в пакетных ручках не принимаем: пакет обрабатывается
+# целиком в одном запросе и без предела держал бы event loop сколько угодно
+MAX_BATCH_SIZE = int(os.environ.get("DEMO_MAX_BATCH_SIZE", "1000"))
+
+profiler = Profiler()
+loop_lag_monitor = LoopLagMonitor(threshold=SLOW_CALLBACK_THRESHOLD)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if ADMIN_ENABLED:
+        loop_lag_monitor.start()
+
+    yield
+
+    if ADMIN_ENABLED:
+        await loop_lag_monitor.stop()
+
+
+app = FastAPI(title="Demo User API", lifespan=lifespan)
+metrics.instrument(app)
+
+
+class InjectedError(HTTPException):
+    pass
 
 
 def maybe_raise_random_error():
     if random.random() < 0.1:
-        raise HTTPException(
+        raise InjectedError(
             status_code=HTTPStatus.INTERNAL_SERVER_ERROR,
             detail="Random error occurred"
         )
 
 
+@app.exception_handler(HTTPException)
+async def count_http_errors(request: Request, exc: HTTPException):
+    if exc.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+        kind = "injected" if isinstance(exc, InjectedError) else "real"
+        metrics.count_error(request, kind)
+
+    return await http_exception_handler(request, exc)
+
+
+@app.exception_handler(Exception)
+async def count_unhandled_errors(request: Request, exc: Exception):
+    metrics.count_error(request, "real")
+    return JSONResponse(
+        {"detail": "Internal Server Error"},
+        status_code=HTTPStatus.INTERNAL_SERVER_ERROR,
+    )
+
+
 @app.post(
     "/create-user",
     response_model=UserResource,
     status_code=HTTPStatus.CREATED,
+    responses={
+        HTTPStatus.CONFLICT: {"description": "Username is already taken"},
+    },
 )
 async def create_user(body: UserRequest) -> UserResource:
     maybe_raise_random_error()
-    return store.insert(body)
+
+    try:
+        return store.insert(body)
+    except store.UsernameTakenError as e:
+        raise HTTPException(HTTPStatus.CONFLICT, str(e))
 
 
 @app.post("/get-user")
@@ -40,3 +96,76 @@ async def get_user(id: Annotated[int, Query()]) -> UserResource:
         raise HTTPException(HTTPStatus.NOT_FOUND)
 
     return resource
+
+
+@app.post("/create-users")
+async def create_users(
+    body: Annotated[list[UserRequest], Body(max_length=MAX_BATCH_SIZE)],
+) -> list[UserResult]:
+    # весь список валидируется FastAPI за один проход, а ошибки отдельных
+    # пользователей не валят пакет и возвращаются в результате по элементу
+    maybe_raise_random_error()
+
+    results = []
+    for user in body:
+        try:
+            resource = store.insert(user)
+        except store.UsernameTakenError as e:
+            results.append(UserResult(status=HTTPStatus.CONFLICT, detail=str(e)))
+        else:
+            results.append(UserResult(status=HTTPStatus.CREATED, user=resource))
+
+    return results
+
+
+@app.post("/get-users")
+async def get_users(
+    ids: Annotated[list[int], Body(max_length=MAX_BATCH_SIZE)],
+) -> list[UserResult]:
+    maybe_raise_random_error()
+
+    return [
+        UserResult(status=HTTPStatus.OK, user=resource)
+        if resource
+        else UserResult(status=HTTPStatus.NOT_FOUND)
+        for resource in store.select_many(ids)
+    ]
+
+
+@app.get("/user/by-username")
+async def get_user_by_username(username: Annotated[str, Query()]) -> UserResource:
+    maybe_raise_random_error()
+
+    resource = store.select_by_username(username)
+
+    if not resource:
+        raise HTTPException(HTTPStatus.NOT_FOUND)
+
+    return resource
+
+
+admin = APIRouter(prefix="/admin")
+
+
+@admin.get("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: Annotated[float, Query(gt=0, le=60)] = 5.0,
+    interval_ms: Annotated[float, Query(ge=1)] = 5.0,
+) -> str:
+    """Стеки потока event loop в collapsed-формате для flamegraph.pl/speedscope"""
+    if profiler.busy:
+        raise HTTPException(HTTPStatus.CONFLICT, "Profiling is already running")
+
+    return await profiler.profile(seconds, interval_ms / 1000)
+
+
+@admin.get("/slow-callbacks")
+async def slow_callbacks() -> dict:
+    return {
+        "threshold": loop_lag_monitor.threshold,
+        "events": [asdict(event) for event in loop_lag_monitor.events],
+    }
+
+
+if ADMIN_ENABLED:
+    app.include_router(admin)
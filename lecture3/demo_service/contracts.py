@@ -16,3 +16,11 @@ class UserRequest(BaseModel):
     first_name: str
     last_name: str
     birthdate: datetime | None = None
+
+
+class UserResult(BaseModel):
+    """Результат по одному элементу пакетного запроса"""
+
+    status: int
+    user: UserResource | None = None
+    detail: str | None = None
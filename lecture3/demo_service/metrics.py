@@ -0,0 +1,89 @@
+import os
+from typing import Sequence
+
+from fastapi import FastAPI, Request
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_fastapi_instrumentator import Instrumentator
+
+
+def _buckets_from_env(name: str, default: Sequence[float]) -> tuple[float, ...]:
+    """Бакеты в секундах через запятую, например `0.0005,0.001,0.01`"""
+    if value := os.environ.get(name):
+        return tuple(sorted(float(bucket) for bucket in value.split(",")))
+
+    return tuple(default)
+
+
+# Ручки работают с памятью и отвечают за доли миллисекунды, а у
+# Instrumentator по умолчанию первый бакет 10ms (highr) и 100ms (lowr)
+HTTP_LATENCY_BUCKETS = _buckets_from_env(
+    "DEMO_HTTP_LATENCY_BUCKETS",
+    (
+        0.00025,
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+    ),
+)
+# у этой гистограммы метки handler и method, поэтому бакетов немного
+HTTP_ROUTE_LATENCY_BUCKETS = _buckets_from_env(
+    "DEMO_HTTP_ROUTE_LATENCY_BUCKETS",
+    (0.0005, 0.001, 0.005, 0.025, 0.1, 0.5),
+)
+
+# операции хранилища - это O(1) обращения к dict, и два perf_counter с
+# Histogram.observe вокруг каждого стоят дороже самой операции: их время
+# видно в гистограммах роутов, а здесь только счетчики
+STORE_SELECT_RESULTS = Counter(
+    "demo_store_select",
+    "Store lookups by result",
+    ["result"],
+)
+STORE_SIZE = Gauge("demo_store_size", "Users in the store")
+ERRORS = Counter(
+    "demo_errors",
+    "Server errors; injected ones come from maybe_raise_random_error",
+    ["handler", "kind"],
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "demo_event_loop_lag_seconds",
+    "How late the event loop wakes up a sleeping task",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+# дочерние метрики с метками создаются заранее, на горячем пути остаются
+# только observe/inc без поиска по меткам
+SELECT_HITS = STORE_SELECT_RESULTS.labels("hit")
+SELECT_MISSES = STORE_SELECT_RESULTS.labels("miss")
+
+
+def instrument(app: FastAPI) -> None:
+    (
+        # handler - шаблон пути, коды сгруппированы в 2xx/4xx/5xx, запросы
+        # мимо роутов не пишутся, так что число серий ограничено роутами
+        Instrumentator(
+            should_group_status_codes=True,
+            should_ignore_untemplated=True,
+            excluded_handlers=["/metrics"],
+        )
+        .instrument(
+            app,
+            latency_highr_buckets=HTTP_LATENCY_BUCKETS,
+            latency_lowr_buckets=HTTP_ROUTE_LATENCY_BUCKETS,
+        )
+        .expose(app)
+    )
+
+
+def count_error(request: Request, kind: str) -> None:
+    route = request.scope.get("route")
+    ERRORS.labels(route.path if route else "untemplated", kind).inc()
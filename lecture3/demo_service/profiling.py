@@ -0,0 +1,154 @@
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from types import FrameType
+
+from demo_service import metrics
+
+MAX_PROFILE_SECONDS = 60.0
+MIN_SAMPLE_INTERVAL = 0.001
+
+
+def collapse_stack(frame: FrameType | None) -> str:
+    """Стек в формате flamegraph.pl: от корня к листу через `;`"""
+    names = []
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        names.append(f"{module}:{frame.f_code.co_qualname}")
+        frame = frame.f_back
+
+    return ";".join(reversed(names))
+
+
+def sample_stacks(thread_id: int, duration: float, interval: float) -> Counter[str]:
+    """Статистический сэмплер стеков чужого потока.
+
+    Работает в своем потоке и раз в `interval` секунд снимает стек
+    `thread_id` через `sys._current_frames`, сам поток при этом никак не
+    инструментируется, поэтому накладные расходы ограничены частотой сэмплов.
+    """
+    stacks = Counter[str]()
+    deadline = time.perf_counter() + duration
+
+    while time.perf_counter() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            stacks[collapse_stack(frame)] += 1
+        del frame
+
+        time.sleep(interval)
+
+    return stacks
+
+
+class Profiler:
+    """Сэмплирование потока event loop по запросу, не больше одного за раз"""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    async def profile(self, seconds: float, interval: float) -> str:
+        seconds = min(seconds, MAX_PROFILE_SECONDS)
+        interval = max(interval, MIN_SAMPLE_INTERVAL)
+
+        async with self._lock:
+            stacks = await asyncio.to_thread(
+                sample_stacks,
+                threading.get_ident(),
+                seconds,
+                interval,
+            )
+
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+@dataclass(slots=True)
+class SlowCallback:
+    at: float
+    blocked_for: float
+    stack: str
+
+
+class LoopLagMonitor:
+    """Отслеживает задержки event loop и ловит медленные колбэки.
+
+    Задача в loop раз в `interval` отмечает heartbeat и пишет фактическую
+    задержку пробуждения в `demo_event_loop_lag_seconds`. Сторожевой поток
+    проверяет heartbeat и, если loop не просыпался дольше `threshold`, снимает
+    стек потока loop - это стек колбэка, который его держит. События хранятся
+    в кольцевом буфере на `max_events` записей.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.1,
+        interval: float = 0.05,
+        max_events: int = 100,
+    ):
+        self.threshold = threshold
+        self.interval = interval
+        self.events = deque[SlowCallback](maxlen=max_events)
+
+        self._heartbeat = time.perf_counter()
+        self._reported_heartbeat = 0.0
+        self._loop_thread_id = 0
+        self._task: asyncio.Task | None = None
+        self._stopped = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.perf_counter()
+        self._stopped.clear()
+
+        self._task = asyncio.create_task(self._tick())
+        self._watchdog = threading.Thread(
+            target=self._watch,
+            name="loop-lag-watchdog",
+            daemon=True,
+        )
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+
+    async def _tick(self) -> None:
+        while True:
+            self._heartbeat = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - self._heartbeat - self.interval
+            metrics.EVENT_LOOP_LAG_SECONDS.observe(max(0.0, lag))
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval):
+            heartbeat = self._heartbeat
+            blocked_for = time.perf_counter() - heartbeat - self.interval
+
+            # один зависший колбэк фиксируется один раз
+            if blocked_for < self.threshold or heartbeat == self._reported_heartbeat:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            self.events.append(
+                SlowCallback(
+                    at=time.time(),
+                    blocked_for=blocked_for,
+                    stack=collapse_stack(frame),
+                )
+            )
+            self._reported_heartbeat = heartbeat
+            del frame
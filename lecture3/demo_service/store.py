@@ -1,8 +1,15 @@
 from typing import Iterable
 
+from demo_service import metrics
 from demo_service.contracts import UserRequest, UserResource
 
 
+class UsernameTakenError(Exception):
+    def __init__(self, username: str):
+        super().__init__(f"Username {username} is already taken")
+        self.username = username
+
+
 def _generate_int_id() -> Iterable[int]:
     i = 0
     while True:
@@ -11,17 +18,62 @@ def _generate_int_id() -> Iterable[int]:
 
 
 _users = dict[int, UserResource]()
+# хэш-индекс username -> uid для поиска и проверки уникальности за O(1)
+_uids_by_username = dict[str, int]()
 _id_generator = _generate_int_id()
 
+metrics.STORE_SIZE.set_function(lambda: len(_users))
+
+
+def _count_lookup(resource: UserResource | None) -> None:
+    if resource is None:
+        metrics.SELECT_MISSES.inc()
+    else:
+        metrics.SELECT_HITS.inc()
+
 
 def insert(user: UserRequest) -> UserResource:
+    if user.username in _uids_by_username:
+        raise UsernameTakenError(user.username)
+
     id = next(_id_generator)
-    resource = UserResource(uid=id, **user.model_dump())
+    # без промежуточного model_dump: проверка уже типизированных полей в
+    # pydantic-core дешевле, чем сборка dict, и быстрее model_construct,
+    # который целиком работает в Python
+    resource = UserResource(
+        uid=id,
+        username=user.username,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        birthdate=user.birthdate,
+    )
 
     _users[id] = resource
-
+    _uids_by_username[user.username] = id
     return resource
 
 
 def select(id: int) -> UserResource | None:
-    return _users.get(id, None)
+    resource = _users.get(id, None)
+    _count_lookup(resource)
+    return resource
+
+
+def select_many(ids: Iterable[int]) -> list[UserResource | None]:
+    resources = [_users.get(id, None) for id in ids]
+    hits = sum(resource is not None for resource in resources)
+    metrics.SELECT_HITS.inc(hits)
+    metrics.SELECT_MISSES.inc(len(resources) - hits)
+    return resources
+
+
+def select_by_username(username: str) -> UserResource | None:
+    id = _uids_by_username.get(username, None)
+    resource = None if id is None else _users[id]
+    _count_lookup(resource)
+    return resource
+
+
+def clear() -> None:
+    _users.clear()
+    _uids_by_username.clear()
@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import random
+import re
+import sqlite3
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from cache import TTLCache
+from main import UserRepository
+
+SQLITE_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY,
+    email TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    age INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+class SqlitePool:
+    """Подмена asyncpg.Pool поверх sqlite3 в памяти.
+
+    Плейсхолдеры `$1` переписываются в `?`, каждый запрос ждет `rtt` секунд,
+    как будто ходит по сети - так видно, сколько походов экономит кэш.
+    """
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.queries = 0
+        self._db = sqlite3.connect(":memory:", isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(SQLITE_SCHEMA)
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    async def fetchrow(self, query: str, *args) -> Optional[sqlite3.Row]:
+        rows = (await self._run(query, args)).fetchall()
+        return rows[0] if rows else None
+
+    async def execute(self, query: str, *args) -> str:
+        cursor = await self._run(query, args)
+        return f"UPDATE {cursor.rowcount}"
+
+    async def _run(self, query: str, args: tuple) -> sqlite3.Cursor:
+        self.queries += 1
+        await asyncio.sleep(self.rtt)
+        return self._db.execute(re.sub(r"\$\d+", "?", query), args)
+
+    async def close(self):
+        self._db.close()
+
+
+async def run(
+    repository: UserRepository,
+    users: int,
+    readers: int,
+    reads: int,
+    write_ratio: float,
+) -> float:
+    ids = [
+        await repository.create_user(f"{uuid.uuid4().hex}@example.com", "Bench User", 30)
+        for _ in range(users)
+    ]
+    # небольшая часть пользователей получает большую часть запросов
+    weights = [1 / rank for rank in range(1, len(ids) + 1)]
+
+    async def reader(seed: int):
+        rnd = random.Random(seed)
+        for user_id in rnd.choices(ids, weights, k=reads):
+            if rnd.random() < write_ratio:
+                await repository.update_user_age(user_id, rnd.randrange(18, 90))
+            else:
+                await repository.get_user_by_id(user_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(reader(seed) for seed in range(readers)))
+    elapsed = time.perf_counter() - start
+
+    if repository.cache is not None:
+        for user_id in ids:
+            cached = repository.cache.peek(user_id)
+            if cached is not None:
+                assert cached == await repository._fetch_user(user_id), f"устаревший кэш для {user_id}"
+
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="UserRepository.get_user_by_id with and without TTLCache")
+    parser.add_argument("--dsn", help="Postgres вместо sqlite-заглушки")
+    parser.add_argument("--rtt-ms", type=float, default=1.0, help="задержка заглушки на запрос")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--readers", type=int, default=50)
+    parser.add_argument("--reads", type=int, default=200, help="запросов на одного читателя")
+    parser.add_argument("--write-ratio", type=float, default=0.01)
+    parser.add_argument("--cache-size", type=int, default=10_000)
+    parser.add_argument("--ttl", type=float, default=30.0)
+    args = parser.parse_args()
+
+    for cache in (None, TTLCache(max_size=args.cache_size, ttl=args.ttl)):
+        repository = UserRepository(args.dsn or "", cache=cache)
+        if args.dsn:
+            await repository.initialize()
+        else:
+            repository.pool = SqlitePool(args.rtt_ms / 1000)
+
+        try:
+            elapsed = await run(repository, args.users, args.readers, args.reads, args.write_ratio)
+        finally:
+            await repository.close()
+
+        requests = args.readers * args.reads
+        line = f"{'cached' if cache else 'plain':>6}: {requests / elapsed:,.0f} req/s"
+        if isinstance(repository.pool, SqlitePool):
+            line += f", queries={repository.pool.queries}"
+        if cache:
+            stats = cache.stats
+            line += (
+                f", hit_ratio={stats.hit_ratio:.1%} coalesced={stats.coalesced}"
+                f" saved_round_trips={stats.saved_round_trips}"
+            )
+        print(line)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+@dataclass
+class CacheStats:
+    """Счетчики кэша: сколько запросов ушло в БД, а сколько нет"""
+
+    requests: int = 0
+    hits: int = 0
+    coalesced: int = 0
+    loads: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.hits / self.requests if self.requests else 0.0
+
+    @property
+    def saved_round_trips(self) -> int:
+        """Запросы, которые обошлись без похода в БД: попадания и ожидания чужой загрузки"""
+        return self.requests - self.loads
+
+
+class TTLCache:
+    """In-process кэш с TTL и вытеснением по LRU.
+
+    Промахи по одному ключу склеиваются: пока идет загрузка, остальные
+    запросы ждут ту же задачу, и в БД уходит один запрос. Если ключ
+    инвалидировали во время загрузки, ее результат в кэш не попадает -
+    он мог быть прочитан до изменения.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        ttl: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Значение из кэша или из `loader`, если его нет или оно протухло"""
+        self.stats.requests += 1
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > self._clock():
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return value
+            del self._entries[key]
+
+        task = self._loading.get(key)
+        if task is None:
+            self.stats.loads += 1
+            # загрузка - отдельная задача: отмена первого запросившего не
+            # роняет тех, кто ждет тот же ключ
+            task = asyncio.ensure_future(loader())
+            task.add_done_callback(partial(self._loaded, key))
+            self._loading[key] = task
+        else:
+            self.stats.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def _loaded(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._loading.get(key) is not task:
+            return
+        del self._loading[key]
+
+        if task.cancelled() or task.exception() is not None:
+            return
+        if (value := task.result()) is not None:
+            self.put(key, value)
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Запись в кэш в обход загрузки (write-through)"""
+        self._loading.pop(key, None)
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+        # текущая загрузка могла прочитать старое значение - не кэшируем ее
+        self._loading.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._loading.clear()
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Значение без учета статистики и без продления LRU"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self._clock():
+            return None
+        return entry[1]
@@ -1,17 +1,43 @@
 import asyncpg
-from typing import Optional, List
+from typing import AsyncIterator, Optional, List, Tuple
+
+from cache import TTLCache
+
+USER_COLUMNS = "id, email, name, age, created_at"
+CREATE_USER_QUERY = f"INSERT INTO users (email, name, age) VALUES ($1, $2, $3) RETURNING {USER_COLUMNS}"
+GET_USER_QUERY = f"SELECT {USER_COLUMNS} FROM users WHERE id = $1"
+GET_USERS_BY_IDS_QUERY = f"SELECT {USER_COLUMNS} FROM users WHERE id = ANY($1::int[])"
+# запросы на каждый вызов API, их можно подготовить заранее при открытии соединения
+HOT_STATEMENTS = (CREATE_USER_QUERY, GET_USER_QUERY, GET_USERS_BY_IDS_QUERY)
+# user_order_stats ведут триггеры на orders (migrations/init.sql), поэтому
+# вместо агрегации всех заказов - одна строка статистики на пользователя;
+# LEFT JOIN и COALESCE оставляют пользователей без этой строки с нулями,
+# как в исходном запросе и в ActiveRecord
+USERS_WITH_ORDERS_QUERY = """
+    SELECT
+        u.id, u.name, u.email,
+        COALESCE(s.order_count, 0) AS order_count,
+        COALESCE(s.total_spent, 0) AS total_spent
+    FROM users u
+    LEFT JOIN user_order_stats s ON s.user_id = u.id
+    ORDER BY total_spent DESC
+"""
+# строк в одном INSERT ... unnest, чтобы не собирать огромные массивы разом
+BULK_CHUNK_SIZE = 10_000
 
 
 class UserRepository:
     """Простой репозиторий для работы с пользователями через asyncpg"""
 
-    def __init__(self, connection_string: str):
+    def __init__(self, connection_string: str, cache: Optional[TTLCache] = None):
         self.connection_string = connection_string
         self.pool: Optional[asyncpg.Pool] = None
+        # кэш для get_user_by_id: create_user пишет в него, update_user_age сбрасывает
+        self.cache = cache
 
-    async def initialize(self):
-        """Инициализация пула соединений"""
-        self.pool = await asyncpg.create_pool(self.connection_string, min_size=2, max_size=10)
+    async def initialize(self, **pool_options):
+        """Инициализация пула соединений, `pool_options` уходят в asyncpg.create_pool"""
+        self.pool = await asyncpg.create_pool(self.connection_string, min_size=2, max_size=10, **pool_options)
 
     async def close(self):
         """Закрытие пула"""
@@ -22,20 +48,75 @@ class UserRepository:
         """Создание нового пользователя"""
         async with self.pool.acquire() as connection:
             row = await connection.fetchrow(
-                "INSERT INTO users (email, name, age) VALUES ($1, $2, $3) RETURNING id",
+                CREATE_USER_QUERY,
                 email, name, age
             )
-            return row['id']
+        if self.cache is not None:
+            self.cache.put(row['id'], dict(row))
+        return row['id']
+
+    async def create_users_bulk(self, users: List[Tuple[str, str, int]]) -> List[int]:
+        """Создание пачки пользователей (email, name, age) в одной транзакции.
+
+        Вместо запроса на каждого пользователя - один INSERT из unnest массивов
+        на каждые BULK_CHUNK_SIZE строк. Порядок RETURNING не гарантирован,
+        поэтому id сопоставляются по уникальному email и возвращаются в
+        порядке `users`.
+        """
+        ids_by_email = {}
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                for start in range(0, len(users), BULK_CHUNK_SIZE):
+                    emails, names, ages = zip(*users[start:start + BULK_CHUNK_SIZE])
+                    rows = await connection.fetch(
+                        """
+                        INSERT INTO users (email, name, age)
+                        SELECT * FROM unnest($1::varchar[], $2::varchar[], $3::int[])
+                        RETURNING id, email
+                        """,
+                        emails, names, ages
+                    )
+                    ids_by_email.update((row['email'], row['id']) for row in rows)
+        return [ids_by_email[email] for email, _, _ in users]
+
+    async def copy_users(self, users: List[Tuple[str, str, int]]) -> int:
+        """Загрузка пользователей через COPY: быстрее всего, но без id"""
+        async with self.pool.acquire() as connection:
+            result = await connection.copy_records_to_table(
+                "users", records=users, columns=["email", "name", "age"]
+            )
+        return int(result.split()[-1])
 
     async def get_user_by_id(self, user_id: int) -> Optional[dict]:
         """Получение пользователя по ID"""
+        if self.cache is None:
+            return await self._fetch_user(user_id)
+
+        user = await self.cache.get(user_id, lambda: self._fetch_user(user_id))
+        # копия, чтобы изменения у вызывающего не попали в кэш
+        return dict(user) if user else None
+
+    async def _fetch_user(self, user_id: int) -> Optional[dict]:
         async with self.pool.acquire() as connection:
             row = await connection.fetchrow(
-                "SELECT id, email, name, age, created_at FROM users WHERE id = $1",
+                GET_USER_QUERY,
                 user_id
             )
             return dict(row) if row else None
 
+    async def get_users_by_ids(self, user_ids: List[int]) -> List[dict]:
+        """Получение пользователей по списку ID одним запросом.
+
+        Порядок как в `user_ids`, ненайденные пропускаются.
+        """
+        async with self.pool.acquire() as connection:
+            rows = await connection.fetch(
+                GET_USERS_BY_IDS_QUERY,
+                user_ids
+            )
+        by_id = {row['id']: row for row in rows}
+        return [dict(by_id[user_id]) for user_id in user_ids if user_id in by_id]
+
     async def update_user_age(self, user_id: int, new_age: int) -> bool:
         """Обновление возраста пользователя"""
         async with self.pool.acquire() as connection:
@@ -43,19 +124,28 @@ class UserRepository:
                 "UPDATE users SET age = $1 WHERE id = $2",
                 new_age, user_id
             )
-            return result.split()[-1] == '1'
+        # не write-through: ответы параллельных UPDATE могут прийти не в том
+        # порядке, в котором они закоммичены, а инвалидация всегда безопасна
+        if self.cache is not None:
+            self.cache.invalidate(user_id)
+        return result.split()[-1] == '1'
 
     async def get_users_with_orders(self) -> List[dict]:
         """Получение пользователей с количеством их заказов (JOIN запрос)"""
         async with self.pool.acquire() as connection:
-            rows = await connection.fetch("""
-                SELECT
-                    u.id, u.name, u.email,
-                    COUNT(o.id) as order_count,
-                    COALESCE(SUM(o.total_price), 0) as total_spent
-                FROM users u
-                LEFT JOIN orders o ON u.id = o.user_id
-                GROUP BY u.id, u.name, u.email
-                ORDER BY total_spent DESC
-            """)
+            rows = await connection.fetch(USERS_WITH_ORDERS_QUERY)
             return [dict(row) for row in rows]
+
+    async def iter_users_with_orders(self, prefetch: int = 1000) -> AsyncIterator[List[asyncpg.Record]]:
+        """То же, что get_users_with_orders, но пачками через серверный курсор.
+
+        За раз с сервера забирается `prefetch` строк, записи отдаются как есть,
+        без копирования в dict, так что память не растет с числом пользователей.
+        Соединение занято, пока генератор не дочитан или не закрыт.
+        """
+        async with self.pool.acquire() as connection:
+            # курсор живет только внутри транзакции
+            async with connection.transaction():
+                cursor = await connection.cursor(USERS_WITH_ORDERS_QUERY)
+                while rows := await cursor.fetch(prefetch):
+                    yield rows
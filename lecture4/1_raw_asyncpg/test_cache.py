@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeLoader:
+    """Загрузчик, который отдает значение только после `release()`"""
+
+    def __init__(self, value="value"):
+        self.value = value
+        self.calls = 0
+        self._released = asyncio.Event()
+
+    def release(self):
+        self._released.set()
+
+    async def __call__(self):
+        self.calls += 1
+        await self._released.wait()
+        return self.value
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_are_coalesced() -> None:
+    cache = TTLCache()
+    loader = FakeLoader()
+
+    waiters = [asyncio.ensure_future(cache.get("key", loader)) for _ in range(3)]
+    await asyncio.sleep(0)
+    loader.release()
+
+    assert await asyncio.gather(*waiters) == ["value"] * 3
+    assert loader.calls == 1
+    assert (cache.stats.loads, cache.stats.coalesced) == (1, 2)
+    assert cache.peek("key") == "value"
+
+
+@pytest.mark.asyncio
+async def test_invalidate_during_load_is_not_cached() -> None:
+    cache = TTLCache()
+    loader = FakeLoader()
+
+    waiter = asyncio.ensure_future(cache.get("key", loader))
+    await asyncio.sleep(0)
+    cache.invalidate("key")  # загрузка могла прочитать значение до изменения
+    loader.release()
+
+    assert await waiter == "value"
+    assert cache.peek("key") is None
+
+    await cache.get("key", loader)
+    assert loader.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_load_survives_cancelled_waiter() -> None:
+    cache = TTLCache()
+    loader = FakeLoader()
+
+    first = asyncio.ensure_future(cache.get("key", loader))
+    second = asyncio.ensure_future(cache.get("key", loader))
+    await asyncio.sleep(0)
+    first.cancel()
+    loader.release()
+
+    assert await second == "value"
+    assert first.cancelled()
+    assert loader.calls == 1
+    assert cache.peek("key") == "value"
+
+
+@pytest.mark.asyncio
+async def test_failed_load_is_not_cached() -> None:
+    cache = TTLCache()
+
+    async def broken():
+        raise ConnectionError("db is down")
+
+    with pytest.raises(ConnectionError):
+        await cache.get("key", broken)
+
+    loader = FakeLoader()
+    loader.release()
+    assert await cache.get("key", loader) == "value"
+    assert loader.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_ttl_expiry() -> None:
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, clock=clock)
+    loader = FakeLoader()
+    loader.release()
+
+    await cache.get("key", loader)
+    clock.now = 9.9
+    await cache.get("key", loader)
+    assert loader.calls == 1
+
+    clock.now = 10
+    assert cache.peek("key") is None
+    await cache.get("key", loader)
+    assert loader.calls == 2
+    assert cache.stats.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction() -> None:
+    cache = TTLCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+
+    loader = FakeLoader()
+    assert await cache.get("a", loader) == 1  # "a" становится самым свежим
+    cache.put("c", 3)
+
+    assert len(cache) == 2
+    assert cache.peek("a") == 1
+    assert cache.peek("b") is None
+    assert cache.peek("c") == 3
+    assert loader.calls == 0
@@ -0,0 +1,114 @@
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine
+
+from main import User, unit_of_work
+
+
+def make_users(count: int) -> List[Tuple[str, str, int]]:
+    return [(f"user{i}@example.com", f"User {i}", 18 + i % 60) for i in range(count)]
+
+
+def create_with_refresh(session: Session, users: List[Tuple[str, str, int]]):
+    """Прежний User.create: add -> commit -> refresh на каждого"""
+    for email, name, age in users:
+        user = User(email=email, name=name, age=age)
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+
+
+def update_with_refresh(session: Session, users: List[User]):
+    """Прежний User.update_age"""
+    for user in users:
+        user.age += 1
+        user.updated_at = datetime.utcnow()
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+
+
+def create_per_call(session: Session, users: List[Tuple[str, str, int]]):
+    for email, name, age in users:
+        User.create(session, email, name, age)
+
+
+def create_in_unit_of_work(session: Session, users: List[Tuple[str, str, int]]):
+    with unit_of_work(session):
+        for email, name, age in users:
+            User.create(session, email, name, age)
+
+
+def create_many(session: Session, users: List[Tuple[str, str, int]]):
+    User.create_many(session, users)
+
+
+def update_per_call(session: Session, users: List[User]):
+    for user in users:
+        user.update_age(session, user.age + 1)
+
+
+def update_in_unit_of_work(session: Session, users: List[User]):
+    with unit_of_work(session):
+        for user in users:
+            user.update_age(session, user.age + 1)
+
+
+def run(path: str, count: int, create: Callable, update: Callable):
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+
+    statements = 0
+
+    def count_statements(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count_statements)
+
+    with Session(engine) as session:
+        start = time.perf_counter()
+        create(session, make_users(count))
+        created = time.perf_counter() - start
+        create_statements = statements
+
+        users = session.query(User).all()
+        statements = 0
+        start = time.perf_counter()
+        update(session, users)
+        updated = time.perf_counter() - start
+
+    engine.dispose()
+    return created, create_statements, updated, statements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="User.create/update_age: commit+refresh vs unit of work")
+    parser.add_argument("--users", type=int, default=10_000)
+    args = parser.parse_args()
+
+    variants = {
+        "commit+refresh": (create_with_refresh, update_with_refresh),
+        "per-call": (create_per_call, update_per_call),
+        "unit_of_work": (create_in_unit_of_work, update_in_unit_of_work),
+        "create_many": (create_many, update_in_unit_of_work),
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, (create, update) in variants.items():
+            path = os.path.join(directory, f"{name}.db")
+            created, create_statements, updated, update_statements = run(path, args.users, create, update)
+            print(
+                f"{name:>15}: create {args.users / created:>9,.0f}/s ({create_statements} statements), "
+                f"update {args.users / updated:>9,.0f}/s ({update_statements} statements)"
+            )
+
+
+if __name__ == "__main__":
+    main()
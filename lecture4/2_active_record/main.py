@@ -1,12 +1,49 @@
-from typing import List, Optional
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import Index, insert, tuple_
 from sqlmodel import SQLModel, Field, Session, select
 
+_UNIT_OF_WORK = "unit_of_work"
+
+
+@contextmanager
+def unit_of_work(session: Session) -> Iterator[Session]:
+    """Одна транзакция на весь блок вместо commit на каждую операцию.
+
+    Изменения копятся в сессии и уходят одним flush при выходе. На
+    PostgreSQL SQLAlchemy группирует INSERT в многострочные INSERT ...
+    RETURNING (insertmanyvalues), на SQLite это по-прежнему INSERT на строку,
+    но без commit на каждую. id приходят в RETURNING.
+    Объекты после commit не протухают, поэтому refresh не нужен. Внутри
+    блока у новых пользователей еще нет id - до выхода или session.flush().
+    Вложенные блоки присоединяются к внешнему.
+    """
+    if session.info.get(_UNIT_OF_WORK):
+        yield session
+        return
+
+    session.info[_UNIT_OF_WORK] = True
+    expire_on_commit = session.expire_on_commit
+    session.expire_on_commit = False
+    try:
+        yield session
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.expire_on_commit = expire_on_commit
+        del session.info[_UNIT_OF_WORK]
+
 
 # === ActiveRecord модели ===
 
 class User(SQLModel, table=True):
     __tablename__ = "users"
+    # под keyset-пагинацию в iter_all_with_stats
+    __table_args__ = (Index("idx_users_created_at_id", "created_at", "id"),)
 
     id: Optional[int] = Field(default=None, primary_key=True)
     email: str = Field(unique=True, index=True, max_length=255)
@@ -21,11 +58,26 @@ class User(SQLModel, table=True):
     def create(cls, session: Session, email: str, name: str, age: int) -> "User":
         """Создание нового пользователя"""
         user = cls(email=email, name=name, age=age)
-        session.add(user)
-        session.commit()
-        session.refresh(user)
+        with unit_of_work(session):
+            session.add(user)
         return user
 
+    @classmethod
+    def create_many(cls, session: Session, users: Iterable[Tuple[str, str, int]]) -> List["User"]:
+        """Создание пачки пользователей (email, name, age) bulk INSERT ... RETURNING"""
+        now = datetime.utcnow()
+        rows = [
+            {"email": email, "name": name, "age": age, "created_at": now, "updated_at": now}
+            for email, name, age in users
+        ]
+        if not rows:
+            return []
+
+        with unit_of_work(session):
+            # bulk insert ORM не вызывает default_factory, даты проставлены выше
+            statement = insert(cls).returning(cls, sort_by_parameter_order=True)
+            return list(session.scalars(statement, rows))
+
     @classmethod
     def find_by_id(cls, session: Session, user_id: int) -> Optional["User"]:
         """Поиск пользователя по ID"""
@@ -40,27 +92,80 @@ class User(SQLModel, table=True):
     @classmethod
     def get_all_with_stats(cls, session: Session) -> List[dict]:
         """Получение всех пользователей со статистикой заказов"""
-        statement = select(cls).order_by(cls.created_at)
-        users = session.exec(statement).all()
+        statement = (
+            select(cls, UserOrderStats)
+            .outerjoin(UserOrderStats, UserOrderStats.user_id == cls.id)
+            .order_by(cls.created_at)
+        )
 
         result = []
-        for user in users:
+        for user, stats in session.exec(statement):
             result.append({
                 "id": user.id,
                 "name": user.name,
                 "email": user.email,
                 "age": user.age,
-                "order_count": 0
+                "order_count": stats.order_count if stats else 0,
+                "total_spent": stats.total_spent if stats else Decimal(0)
             })
         return result
 
+    @classmethod
+    def iter_all_with_stats(cls, session: Session, page_size: int = 1000) -> Iterator[dict]:
+        """То же, что get_all_with_stats, но постранично.
+
+        Страницы выбираются по ключу (created_at, id) после последней строки
+        предыдущей, а не через OFFSET, так что каждая страница - проход по
+        индексу idx_users_created_at_id независимо от размера таблицы. Берутся
+        только нужные колонки, ORM-объекты и identity map не создаются.
+        Сравнение кортежа с NULL дает NULL, поэтому пользователи без
+        created_at идут после остальных отдельной серией страниц по id.
+        """
+        statement = (
+            select(
+                cls.id,
+                cls.name,
+                cls.email,
+                cls.age,
+                cls.created_at,
+                UserOrderStats.order_count,
+                UserOrderStats.total_spent,
+            )
+            .outerjoin(UserOrderStats, UserOrderStats.user_id == cls.id)
+            .limit(page_size)
+        )
+        series = (
+            (
+                statement.where(cls.created_at.is_not(None)).order_by(cls.created_at, cls.id),
+                lambda last: tuple_(cls.created_at, cls.id) > (last.created_at, last.id),
+            ),
+            (
+                statement.where(cls.created_at.is_(None)).order_by(cls.id),
+                lambda last: cls.id > last.id,
+            ),
+        )
+
+        for first_page, after in series:
+            page = first_page
+            while rows := session.execute(page).all():
+                for row in rows:
+                    yield {
+                        "id": row.id,
+                        "name": row.name,
+                        "email": row.email,
+                        "age": row.age,
+                        "order_count": row.order_count or 0,
+                        "total_spent": row.total_spent or Decimal(0)
+                    }
+
+                page = first_page.where(after(rows[-1]))
+
     def update_age(self, session: Session, new_age: int) -> "User":
         """Обновление возраста пользователя"""
         self.age = new_age
         self.updated_at = datetime.utcnow()
-        session.add(self)
-        session.commit()
-        session.refresh(self)
+        with unit_of_work(session):
+            session.add(self)
         return self
 
     def to_dict(self) -> dict:
@@ -72,3 +177,12 @@ class User(SQLModel, table=True):
             "age": self.age,
             "created_at": self.created_at
         }
+
+
+class UserOrderStats(SQLModel, table=True):
+    """Статистика заказов пользователя, ее ведут триггеры в migrations/init.sql"""
+    __tablename__ = "user_order_stats"
+
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    order_count: int = 0
+    total_spent: Decimal = Field(default=0, max_digits=12, decimal_places=2)
@@ -0,0 +1,143 @@
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from main import User, UserMapper, UserOrm, insert_if_email_free, users_page
+
+
+# === Движок и сессии ===
+
+def create_async_session_factory(
+    url: str,
+    pool_size: int = 20,
+    max_overflow: int = 0,
+    pool_timeout: float = 10.0,
+) -> async_sessionmaker[AsyncSession]:
+    """Фабрика AsyncSession поверх пула asyncpg-соединений.
+
+    Один процесс с event loop обслуживает сотни корутин, но одновременно
+    работать с БД может не больше `pool_size`, остальные ждут соединение до
+    `pool_timeout`. Без overflow число соединений на процесс фиксировано -
+    его удобно сверять с max_connections Postgres, умножив на число воркеров.
+    expire_on_commit выключен: после commit атрибуты нельзя лениво
+    дочитать без await, доменные модели и так собираются заранее.
+    """
+    engine = create_async_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+    )
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+# === Абстрактные интерфейсы репозиториев ===
+
+class AsyncUserRepositoryInterface(ABC):
+    """Асинхронный вариант UserRepositoryInterface с тем же контрактом"""
+
+    @abstractmethod
+    async def create(self, user: User) -> User:
+        pass
+
+    @abstractmethod
+    async def create_if_email_free(self, user: User) -> Optional[User]:
+        """Создание пользователя, None - если email уже занят"""
+        pass
+
+    @abstractmethod
+    async def find_by_id(self, user_id: int) -> Optional[User]:
+        pass
+
+    @abstractmethod
+    async def find_by_email(self, email: str) -> Optional[User]:
+        pass
+
+    @abstractmethod
+    async def get_all(self) -> List[User]:
+        pass
+
+    @abstractmethod
+    def iter_all(self, page_size: int = 1000) -> AsyncIterator[User]:
+        pass
+
+    @abstractmethod
+    async def update(self, user: User) -> User:
+        pass
+
+
+# === Конкретные реализации репозиториев ===
+
+class AsyncSqlAlchemyUserRepository(AsyncUserRepositoryInterface):
+    """SQLAlchemy asyncio реализация репозитория пользователей"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create(self, user: User) -> User:
+        orm_user = UserMapper.to_orm(user)
+        self.session.add(orm_user)
+        await self.session.flush()  # Получаем ID без коммита
+        return UserMapper.to_domain(orm_user)
+
+    async def create_if_email_free(self, user: User) -> Optional[User]:
+        statement = insert_if_email_free(self.session.get_bind().dialect.name, user)
+        orm_user = (await self.session.scalars(statement)).first()
+        return UserMapper.to_domain(orm_user) if orm_user else None
+
+    async def find_by_id(self, user_id: int) -> Optional[User]:
+        orm_user = await self.session.get(UserOrm, user_id)
+        return UserMapper.to_domain(orm_user) if orm_user else None
+
+    async def find_by_email(self, email: str) -> Optional[User]:
+        orm_user = await self.session.scalar(select(UserOrm).filter_by(email=email).limit(1))
+        return UserMapper.to_domain(orm_user) if orm_user else None
+
+    async def get_all(self) -> List[User]:
+        orm_users = await self.session.scalars(select(UserOrm).order_by(UserOrm.created_at))
+        return [UserMapper.to_domain(orm_user) for orm_user in orm_users]
+
+    async def iter_all(self, page_size: int = 1000) -> AsyncIterator[User]:
+        for undated in (False, True):
+            last = None
+            while rows := (await self.session.execute(users_page(page_size, last, undated))).all():
+                for row in rows:
+                    yield User(id=row.id, email=row.email, name=row.name, age=row.age)
+                last = rows[-1]
+
+    async def update(self, user: User) -> User:
+        orm_user = await self.session.get(UserOrm, user.id)
+        if not orm_user:
+            raise ValueError(f"User with id {user.id} not found")
+
+        UserMapper.to_orm(user, orm_user)
+        await self.session.flush()
+        return UserMapper.to_domain(orm_user)
+
+
+# === Сервисы для бизнес-логики ===
+
+class AsyncUserService:
+    """Асинхронный сервис для работы с пользователями"""
+
+    def __init__(self, user_repo: AsyncUserRepositoryInterface):
+        self.user_repo = user_repo
+
+    async def create_user(self, email: str, name: str, age: int) -> User:
+        """Создание нового пользователя с валидацией"""
+        if age < 0:
+            raise ValueError("Age cannot be negative")
+
+        user = await self.user_repo.create_if_email_free(User(email=email, name=name, age=age))
+        if user is None:
+            raise ValueError(f"User with email {email} already exists")
+        return user
+
+    async def get_user_with_validation(self, user_id: int) -> User:
+        """Получение пользователя с проверкой существования"""
+        user = await self.user_repo.find_by_id(user_id)
+        if not user:
+            raise ValueError(f"User with id {user_id} not found")
+        return user
@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+
+from async_repository import AsyncSqlAlchemyUserRepository, AsyncUserService, create_async_session_factory
+from main import SqlAlchemyUserRepository, UserOrm, UserService
+
+DEFAULT_DSN = "postgres:password@localhost:5432/hw4_db"
+
+
+def seed(session_factory: sessionmaker, count: int) -> List[int]:
+    with session_factory() as session:
+        users = [
+            UserOrm(email=f"bench-{uuid.uuid4().hex}@example.com", name="Bench", age=30)
+            for _ in range(count)
+        ]
+        session.add_all(users)
+        session.commit()
+        return [user.id for user in users]
+
+
+def cleanup(session_factory: sessionmaker):
+    with session_factory() as session:
+        session.execute(delete(UserOrm).where(UserOrm.email.like("bench-%")))
+        session.commit()
+
+
+async def drive(
+    request: Callable[[int], Awaitable[None]],
+    concurrency: int,
+    requests: int,
+) -> List[float]:
+    latencies = []
+
+    async def worker(seed: int):
+        rnd = random.Random(seed)
+        for _ in range(requests // concurrency):
+            start = time.perf_counter()
+            await request(rnd.randrange(1 << 30))
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker(seed) for seed in range(concurrency)))
+    return latencies
+
+
+def report(name: str, latencies: List[float], elapsed: float):
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:>18}: {len(latencies) / elapsed:>8,.0f} req/s "
+        f"p50={quantiles[49] * 1e3:.2f}ms p99={quantiles[98] * 1e3:.2f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Sync repository in a thread pool vs AsyncSqlAlchemyUserRepository")
+    parser.add_argument("--dsn", default=DEFAULT_DSN, help="user:password@host:port/db")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--pool-size", type=int, default=20)
+    parser.add_argument("--write-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+
+    sync_factory = sessionmaker(
+        create_engine(f"postgresql+psycopg2://{args.dsn}", pool_size=args.pool_size, max_overflow=0)
+    )
+    async_factory = create_async_session_factory(f"postgresql+asyncpg://{args.dsn}", pool_size=args.pool_size)
+
+    cleanup(sync_factory)
+    ids = seed(sync_factory, args.users)
+
+    def sync_request(key: int):
+        with sync_factory() as session:
+            service = UserService(SqlAlchemyUserRepository(session))
+            if key % 1000 < args.write_ratio * 1000:
+                service.create_user(f"bench-{uuid.uuid4().hex}@example.com", "Bench", 30)
+                session.commit()
+            else:
+                service.get_user_with_validation(ids[key % len(ids)])
+
+    async def async_request(key: int):
+        async with async_factory() as session:
+            service = AsyncUserService(AsyncSqlAlchemyUserRepository(session))
+            if key % 1000 < args.write_ratio * 1000:
+                await service.create_user(f"bench-{uuid.uuid4().hex}@example.com", "Bench", 30)
+                await session.commit()
+            else:
+                await service.get_user_with_validation(ids[key % len(ids)])
+
+    loop = asyncio.get_running_loop()
+    # потоков столько же, сколько соединений: больше упрется в пул, меньше - не нагрузит его
+    executor = ThreadPoolExecutor(max_workers=args.pool_size)
+
+    async def threaded_request(key: int):
+        await loop.run_in_executor(executor, sync_request, key)
+
+    try:
+        for name, request in (("sync+threadpool", threaded_request), ("async", async_request)):
+            await drive(request, args.concurrency, args.requests // 10)  # прогрев
+            start = time.perf_counter()
+            latencies = await drive(request, args.concurrency, args.requests)
+            report(name, latencies, time.perf_counter() - start)
+    finally:
+        executor.shutdown()
+        cleanup(sync_factory)
+        await async_factory.kw["bind"].dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,8 +1,14 @@
-from typing import List, Optional
-from dataclasses import dataclass
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from dataclasses import dataclass, replace
 from abc import ABC, abstractmethod
 
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index, Insert, Row, Select, event, inspect, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
@@ -26,12 +32,17 @@ Base = declarative_base()
 
 class UserOrm(Base):
     __tablename__ = 'users'
+    # под keyset-пагинацию в iter_all
+    __table_args__ = (Index('idx_users_created_at_id', 'created_at', 'id'),)
 
     id = Column(Integer, primary_key=True)
     email = Column(String(255), unique=True, nullable=False)
     name = Column(String(255), nullable=False)
     age = Column(Integer, nullable=False)
-    created_at = Column(DateTime, default=func.now())
+    # значение с клиента, а не func.now(): SQLite хранит CURRENT_TIMESTAMP
+    # без микросекунд, и сравнение с курсором iter_all из Python datetime
+    # (`... 09:12:39.000000`) теряло строки с той же секундой
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
 
@@ -66,6 +77,126 @@ class UserMapper:
         return orm_user
 
 
+def insert_if_email_free(dialect_name: str, user: User) -> Insert:
+    """INSERT ... ON CONFLICT (email) DO NOTHING RETURNING пользователя.
+
+    Проверка уникальности и вставка - один запрос, атомарный на стороне БД:
+    при занятом email RETURNING пуст.
+    """
+    dialect_insert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}[dialect_name]
+    return (
+        dialect_insert(UserOrm)
+        .values(email=user.email, name=user.name, age=user.age)
+        .on_conflict_do_nothing(index_elements=[UserOrm.email])
+        .returning(UserOrm)
+    )
+
+
+def users_page(page_size: int, after: Optional[Row] = None, undated: bool = False) -> Select:
+    """Колонки доменной модели для страницы пользователей после строки `after`.
+
+    Сравнение (created_at, id) с NULL дает NULL, поэтому пользователи без
+    created_at выбираются отдельной серией страниц по id (`undated=True`).
+    """
+    statement = select(UserOrm.id, UserOrm.email, UserOrm.name, UserOrm.age, UserOrm.created_at).limit(page_size)
+
+    if undated:
+        statement = statement.where(UserOrm.created_at.is_(None)).order_by(UserOrm.id)
+        if after is not None:
+            statement = statement.where(UserOrm.id > after.id)
+    else:
+        statement = statement.where(UserOrm.created_at.is_not(None)).order_by(UserOrm.created_at, UserOrm.id)
+        if after is not None:
+            statement = statement.where(tuple_(UserOrm.created_at, UserOrm.id) > (after.created_at, after.id))
+    return statement
+
+
+# === Кэш второго уровня ===
+
+class UserCache:
+    """Доменные пользователи, общие для всех сессий, с вытеснением по LRU.
+
+    Отдает копии, чтобы изменения у вызывающего не попадали в кэш. Запись
+    живет не дольше `ttl` секунд. Читающий из БД берет `version()` до
+    запроса, и `put` отбрасывает значение, если пользователя с тех пор
+    инвалидировали: иначе строка, прочитанная до чужого commit, вернулась
+    бы в кэш уже после его invalidate.
+    """
+
+    def __init__(self, max_size: int = 10_000, ttl: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._by_id: "OrderedDict[int, Tuple[User, float]]" = OrderedDict()
+        self._id_by_email: Dict[str, int] = {}
+        self._version = 0
+        # последние инвалидации по возрастанию версии; про вытесненные из
+        # журнала известно только, что они не новее _forgotten
+        self._invalidated: "OrderedDict[int, int]" = OrderedDict()
+        self._forgotten = 0
+        self._lock = threading.Lock()
+
+    def version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def get(self, user_id: int) -> Optional[User]:
+        with self._lock:
+            return self._get(user_id)
+
+    def get_by_email(self, email: str) -> Optional[User]:
+        with self._lock:
+            user_id = self._id_by_email.get(email)
+            if user_id is None:
+                self.misses += 1
+                return None
+            return self._get(user_id)
+
+    def put(self, user: User, version: int) -> None:
+        """Значение, прочитанное из БД после `version()`"""
+        with self._lock:
+            if version < self._forgotten or self._invalidated.get(user.id, -1) > version:
+                return
+
+            self._remove(user.id)
+            self._by_id[user.id] = (replace(user), self._clock() + self.ttl)
+            self._id_by_email[user.email] = user.id
+
+            while len(self._by_id) > self.max_size:
+                _, (evicted, _) = self._by_id.popitem(last=False)
+                del self._id_by_email[evicted.email]
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._remove(user_id)
+
+            self._version += 1
+            self._invalidated.pop(user_id, None)
+            self._invalidated[user_id] = self._version
+            if len(self._invalidated) > self.max_size:
+                _, self._forgotten = self._invalidated.popitem(last=False)
+
+    def _get(self, user_id: int) -> Optional[User]:
+        entry = self._by_id.get(user_id)
+        if entry is not None and entry[1] <= self._clock():
+            self._remove(user_id)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._by_id.move_to_end(user_id)
+        self.hits += 1
+        return replace(entry[0])
+
+    def _remove(self, user_id: int) -> None:
+        entry = self._by_id.pop(user_id, None)
+        if entry is not None:
+            del self._id_by_email[entry[0].email]
+
+
 # === Абстрактные интерфейсы репозиториев ===
 
 class UserRepositoryInterface(ABC):
@@ -75,6 +206,11 @@ class UserRepositoryInterface(ABC):
     def create(self, user: User) -> User:
         pass
 
+    @abstractmethod
+    def create_if_email_free(self, user: User) -> Optional[User]:
+        """Создание пользователя, None - если email уже занят"""
+        pass
+
     @abstractmethod
     def find_by_id(self, user_id: int) -> Optional[User]:
         pass
@@ -87,6 +223,10 @@ class UserRepositoryInterface(ABC):
     def get_all(self) -> List[User]:
         pass
 
+    @abstractmethod
+    def iter_all(self, page_size: int = 1000) -> Iterator[User]:
+        pass
+
     @abstractmethod
     def update(self, user: User) -> User:
         pass
@@ -97,36 +237,169 @@ class UserRepositoryInterface(ABC):
 class SqlAlchemyUserRepository(UserRepositoryInterface):
     """SQLAlchemy реализация репозитория пользователей"""
 
-    def __init__(self, session: Session):
+    # сколько последних пользователей репозиторий держит сильными ссылками
+    LOADED_MAX_SIZE = 1000
+
+    def __init__(self, session: Session, cache: Optional[UserCache] = None):
         self.session = session
+        self.cache = cache
+        # identity map сессии держит объекты по слабым ссылкам, и только что
+        # созданный или найденный пользователь из нее пропадает, как только на
+        # него не осталось ссылок - репозиторий держит последние сам
+        self._loaded: "OrderedDict[int, UserOrm]" = OrderedDict()
+        # пользователи, измененные в текущей транзакции: их незакоммиченное
+        # состояние нельзя ни класть в общий кэш, ни читать из него
+        self._changed: Set[int] = set()
+
+        _register_repository(session, self)
 
     def create(self, user: User) -> User:
         orm_user = UserMapper.to_orm(user)
         self.session.add(orm_user)
         self.session.flush()  # Получаем ID без коммита
+        self._remember(orm_user)
+        self._changed.add(orm_user.id)
+        return UserMapper.to_domain(orm_user)
+
+    def create_if_email_free(self, user: User) -> Optional[User]:
+        statement = insert_if_email_free(self.session.get_bind().dialect.name, user)
+        orm_user = self.session.scalars(statement).first()
+        if orm_user is None:
+            return None
+
+        self._remember(orm_user)
+        self._changed.add(orm_user.id)
         return UserMapper.to_domain(orm_user)
 
     def find_by_id(self, user_id: int) -> Optional[User]:
-        orm_user = self.session.query(UserOrm).filter_by(id=user_id).first()
-        return UserMapper.to_domain(orm_user) if orm_user else None
+        # сначала объекты этой сессии: уже загруженный или созданный в ней
+        # пользователь отдается без запроса, пока commit его не протушил, а
+        # удаленный или отсоединенный от сессии из запомненных выкидывается
+        orm_user = self._loaded.get(user_id)
+        if orm_user is not None:
+            state = inspect(orm_user)
+            if state.persistent and not state.expired:
+                return UserMapper.to_domain(orm_user)
+            if not state.persistent:
+                del self._loaded[user_id]
+
+        if not self._cacheable(user_id):
+            orm_user = self.session.get(UserOrm, user_id)
+            return self._to_domain(orm_user) if orm_user else None
+
+        if (user := self.cache.get(user_id)) is not None:
+            return user
+        version = self.cache.version()
+        orm_user = self.session.get(UserOrm, user_id, populate_existing=True)
+        return self._to_domain_cached(orm_user, version) if orm_user else None
 
     def find_by_email(self, email: str) -> Optional[User]:
-        orm_user = self.session.query(UserOrm).filter_by(email=email).first()
-        return UserMapper.to_domain(orm_user) if orm_user else None
+        statement = select(UserOrm).filter_by(email=email).limit(1)
+        if self.cache is None:
+            orm_user = self.session.scalar(statement)
+            return self._to_domain(orm_user) if orm_user else None
+
+        user = self.cache.get_by_email(email)
+        if user is not None and user.id not in self._changed:
+            return user
+
+        version = self.cache.version()
+        orm_user = self.session.scalar(statement.execution_options(populate_existing=True))
+        return self._to_domain_cached(orm_user, version) if orm_user else None
 
     def get_all(self) -> List[User]:
         orm_users = self.session.query(UserOrm).order_by(UserOrm.created_at).all()
         return [UserMapper.to_domain(orm_user) for orm_user in orm_users]
 
+    def iter_all(self, page_size: int = 1000) -> Iterator[User]:
+        """Все пользователи страницами по (created_at, id), без created_at - в конце.
+
+        Выбираются только колонки доменной модели, без ORM-объектов и
+        identity map, а каждая страница начинается сразу после последней
+        строки предыдущей - без OFFSET и без загрузки всей таблицы.
+        """
+        for undated in (False, True):
+            last = None
+            while rows := self.session.execute(users_page(page_size, last, undated)).all():
+                for row in rows:
+                    yield User(id=row.id, email=row.email, name=row.name, age=row.age)
+                last = rows[-1]
+
     def update(self, user: User) -> User:
-        orm_user = self.session.query(UserOrm).filter_by(id=user.id).first()
+        orm_user = self.session.get(UserOrm, user.id)
         if not orm_user:
             raise ValueError(f"User with id {user.id} not found")
 
         UserMapper.to_orm(user, orm_user)
         self.session.flush()
+        self._remember(orm_user)
+        self._changed.add(user.id)
+        if self.cache is not None:
+            self.cache.invalidate(user.id)
         return UserMapper.to_domain(orm_user)
 
+    def _cacheable(self, user_id: int) -> bool:
+        return self.cache is not None and user_id not in self._changed
+
+    def _remember(self, orm_user: UserOrm) -> None:
+        self._loaded[orm_user.id] = orm_user
+        self._loaded.move_to_end(orm_user.id)
+        if len(self._loaded) > self.LOADED_MAX_SIZE:
+            self._loaded.popitem(last=False)
+
+    def _to_domain(self, orm_user: UserOrm) -> User:
+        self._remember(orm_user)
+        return UserMapper.to_domain(orm_user)
+
+    def _to_domain_cached(self, orm_user: UserOrm, version: int) -> User:
+        # в общий кэш попадает только строка, загруженная из БД этим запросом
+        # (populate_existing), а не объект, который уже был в identity map
+        user = self._to_domain(orm_user)
+        if self._cacheable(user.id):
+            self.cache.put(user, version)
+        return user
+
+    def _after_commit(self) -> None:
+        # другая сессия могла закэшировать старое значение, пока эта
+        # транзакция еще не была закоммичена
+        if self.cache is not None:
+            for user_id in self._changed:
+                self.cache.invalidate(user_id)
+        self._changed.clear()
+
+    def _after_rollback(self) -> None:
+        # созданные в транзакции пользователи исчезли вместе с ней
+        for user_id in self._changed:
+            self._loaded.pop(user_id, None)
+        self._changed.clear()
+
+
+def _register_repository(session: Session, repository: SqlAlchemyUserRepository) -> None:
+    """Обработчики commit/rollback вешаются на сессию один раз, на все ее репозитории.
+
+    Репозитории хранятся по слабым ссылкам: созданный на один запрос
+    репозиторий не живет до конца сессии из-за подписки на ее события.
+    """
+    repositories = session.info.get("user_repositories")
+    if repositories is None:
+        repositories = session.info["user_repositories"] = weakref.WeakSet()
+        event.listen(session, "after_commit", _after_commit)
+        event.listen(session, "after_soft_rollback", _after_soft_rollback)
+    repositories.add(repository)
+
+
+def _after_commit(session: Session) -> None:
+    for repository in list(session.info["user_repositories"]):
+        repository._after_commit()
+
+
+def _after_soft_rollback(session: Session, previous_transaction) -> None:
+    # откат savepoint не отменяет изменений внешней транзакции
+    if previous_transaction.parent is not None:
+        return
+    for repository in list(session.info["user_repositories"]):
+        repository._after_rollback()
+
 
 # === Сервисы для бизнес-логики ===
 
@@ -138,15 +411,14 @@ class UserService:
 
     def create_user(self, email: str, name: str, age: int) -> User:
         """Создание нового пользователя с валидацией"""
-        existing_user = self.user_repo.find_by_email(email)
-        if existing_user:
-            raise ValueError(f"User with email {email} already exists")
-
         if age < 0:
             raise ValueError("Age cannot be negative")
 
-        user = User(email=email, name=name, age=age)
-        return self.user_repo.create(user)
+        # не find_by_email + create: между ними email может занять параллельная регистрация
+        user = self.user_repo.create_if_email_free(User(email=email, name=name, age=age))
+        if user is None:
+            raise ValueError(f"User with email {email} already exists")
+        return user
 
     def get_user_with_validation(self, user_id: int) -> User:
         """Получение пользователя с проверкой существования"""
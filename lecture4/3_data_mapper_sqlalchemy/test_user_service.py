@@ -0,0 +1,212 @@
+import asyncio
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine, delete, func, select
+from sqlalchemy.orm import sessionmaker
+
+from main import Base, SqlAlchemyUserRepository, User, UserCache, UserOrm, UserService
+
+# например postgres:password@localhost:5432/hw4_db из docker-compose
+POSTGRES = os.environ.get("LECTURE4_DATABASE_URL")
+SIGNUPS = 16
+
+
+@pytest.fixture
+def sqlite_url(tmp_path) -> str:
+    url = f"sqlite:///{tmp_path / 'users.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    return url
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def session_factory(request, sqlite_url):
+    if request.param == "postgresql":
+        if not POSTGRES:
+            pytest.skip("LECTURE4_DATABASE_URL is not set")
+        engine = create_engine(f"postgresql+psycopg2://{POSTGRES}", pool_size=SIGNUPS)
+    else:
+        engine = create_engine(sqlite_url, connect_args={"timeout": 30})
+
+    yield sessionmaker(engine)
+    engine.dispose()
+
+
+def count_users(session_factory, email: str) -> int:
+    with session_factory() as session:
+        return session.scalar(select(func.count()).where(UserOrm.email == email))
+
+
+def delete_users(session_factory, email: str):
+    with session_factory() as session:
+        session.execute(delete(UserOrm).where(UserOrm.email == email))
+        session.commit()
+
+
+def test_create_user(session_factory):
+    email = f"{uuid.uuid4().hex}@example.com"
+
+    with session_factory() as session:
+        service = UserService(SqlAlchemyUserRepository(session))
+        user = service.create_user(email, "Alice", 30)
+        session.commit()
+
+        assert user.id is not None
+        assert service.get_user_with_validation(user.id) == user
+
+        with pytest.raises(ValueError, match="already exists"):
+            service.create_user(email, "Alice", 30)
+        with pytest.raises(ValueError, match="negative"):
+            service.create_user(f"other-{email}", "Alice", -1)
+
+    delete_users(session_factory, email)
+
+
+def test_parallel_signups_with_same_email(session_factory):
+    email = f"{uuid.uuid4().hex}@example.com"
+    barrier = threading.Barrier(SIGNUPS)
+
+    def signup(i: int) -> str:
+        with session_factory() as session:
+            service = UserService(SqlAlchemyUserRepository(session))
+            barrier.wait()
+            try:
+                service.create_user(email, f"User {i}", 30)
+                session.commit()
+                return "created"
+            except ValueError:
+                return "exists"
+
+    with ThreadPoolExecutor(SIGNUPS) as executor:
+        results = list(executor.map(signup, range(SIGNUPS)))
+
+    assert results.count("created") == 1
+    assert results.count("exists") == SIGNUPS - 1
+    assert count_users(session_factory, email) == 1
+
+    delete_users(session_factory, email)
+
+
+def test_cache_is_not_filled_from_stale_identity_map(session_factory):
+    email = f"{uuid.uuid4().hex}@example.com"
+    cache = UserCache()
+
+    with session_factory() as setup:
+        user = UserService(SqlAlchemyUserRepository(setup)).create_user(email, "Alice", 1)
+        setup.commit()
+
+    with session_factory() as session_a:
+        repo_a = SqlAlchemyUserRepository(session_a, cache)
+        assert repo_a.find_by_id(user.id).age == 1
+
+        with session_factory() as session_b:
+            repo_b = SqlAlchemyUserRepository(session_b, cache)
+            repo_b.update(User(id=user.id, email=email, name="Alice", age=99))
+            session_b.commit()
+
+        # в identity map A все еще лежит объект с age=1
+        assert repo_a.find_by_email(email).age == 99
+
+    with session_factory() as session_c:
+        assert SqlAlchemyUserRepository(session_c, cache).find_by_id(user.id).age == 99
+
+    delete_users(session_factory, email)
+
+
+def test_find_by_id_skips_deleted_user(session_factory):
+    email = f"{uuid.uuid4().hex}@example.com"
+
+    with session_factory() as session:
+        repo = SqlAlchemyUserRepository(session)
+        user = UserService(repo).create_user(email, "Alice", 1)
+        assert repo.find_by_id(user.id) is not None
+
+        session.delete(session.get(UserOrm, user.id))
+        session.flush()
+        assert repo.find_by_id(user.id) is None
+
+        session.commit()
+        assert repo.find_by_id(user.id) is None
+
+
+def test_user_cache_ttl_and_versions():
+    now = [0.0]
+    cache = UserCache(ttl=10, clock=lambda: now[0])
+    user = User(id=1, email="a@example.com", name="A", age=1)
+
+    # значение прочитано до invalidate - в кэш не попадает
+    version = cache.version()
+    cache.invalidate(1)
+    cache.put(user, version)
+    assert cache.get(1) is None
+
+    cache.put(user, cache.version())
+    assert cache.get_by_email("a@example.com") == user
+
+    now[0] = 10
+    assert cache.get(1) is None
+    assert cache.get_by_email("a@example.com") is None
+
+
+def test_repositories_share_one_listener(sqlite_url):
+    engine = create_engine(sqlite_url)
+    with sessionmaker(engine)() as session:
+        repositories = [SqlAlchemyUserRepository(session) for _ in range(3)]
+        assert len(session.info["user_repositories"]) == 3
+
+        del repositories
+        assert len(session.info["user_repositories"]) == 0
+    engine.dispose()
+
+
+def test_iter_all_includes_users_without_created_at(session_factory):
+    prefix = uuid.uuid4().hex
+    emails = [f"{prefix}-{i}@example.com" for i in range(5)]
+
+    with session_factory() as session:
+        users = [UserOrm(email=email, name="Bob", age=30) for email in emails]
+        session.add_all(users)
+        session.flush()
+        users[1].created_at = users[3].created_at = None
+        session.commit()
+
+        listed = [user.email for user in SqlAlchemyUserRepository(session).iter_all(page_size=2)]
+        assert sorted(email for email in listed if email.startswith(prefix)) == emails
+        assert len(listed) == len(set(listed))
+
+        session.execute(delete(UserOrm).where(UserOrm.email.in_(emails)))
+        session.commit()
+
+
+@pytest.mark.skipif(not POSTGRES, reason="LECTURE4_DATABASE_URL is not set")
+@pytest.mark.asyncio
+async def test_parallel_signups_with_same_email_async():
+    from async_repository import AsyncSqlAlchemyUserRepository, AsyncUserService, create_async_session_factory
+
+    factory = create_async_session_factory(f"postgresql+asyncpg://{POSTGRES}", pool_size=SIGNUPS)
+    email = f"{uuid.uuid4().hex}@example.com"
+
+    async def signup(i: int) -> str:
+        async with factory() as session:
+            service = AsyncUserService(AsyncSqlAlchemyUserRepository(session))
+            try:
+                await service.create_user(email, f"User {i}", 30)
+                await session.commit()
+                return "created"
+            except ValueError:
+                return "exists"
+
+    results = await asyncio.gather(*(signup(i) for i in range(SIGNUPS)))
+    await factory.kw["bind"].dispose()
+
+    assert results.count("created") == 1
+    assert results.count("exists") == SIGNUPS - 1
+
+    sync_factory = sessionmaker(create_engine(f"postgresql+psycopg2://{POSTGRES}"))
+    assert count_users(sync_factory, email) == 1
+    delete_users(sync_factory, email)
@@ -0,0 +1,95 @@
+"""create_order по одному против пакетного create_orders.
+
+    edgedb project init && edgedb migrate
+    python bench_orders.py --orders 1000 --batch 100
+
+Клиент берет подключение из проекта EdgeDB (или EDGEDB_DSN).
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from decimal import Decimal
+from typing import List
+
+import edgedb
+
+from orders import OrderItem, create_orders, create_orders_one_by_one, load_query
+
+CREATE_USER_QUERY = load_query("create_user")
+CREATE_PRODUCT_QUERY = load_query("create_product")
+
+
+async def seed(client: edgedb.AsyncIOClient, products: int):
+    user = await client.query_single(
+        CREATE_USER_QUERY, email=f"bench-{uuid.uuid4().hex}@example.com", name="Bench", age=30
+    )
+    product_ids = [
+        (await client.query_single(
+            CREATE_PRODUCT_QUERY, name=f"bench-{i}", price=Decimal("9.99"), description=None, in_stock=True
+        )).id
+        for i in range(products)
+    ]
+    return user.id, product_ids
+
+
+async def cleanup(client: edgedb.AsyncIOClient):
+    await client.execute("DELETE Order FILTER .product.name LIKE 'bench-%'")
+    await client.execute("DELETE Product FILTER .name LIKE 'bench-%'")
+    await client.execute("DELETE User FILTER .email LIKE 'bench-%'")
+
+
+async def timed(name: str, count: int, coroutine) -> List[uuid.UUID]:
+    start = time.perf_counter()
+    result = await coroutine
+    elapsed = time.perf_counter() - start
+    print(f"{name:>20}: {elapsed:7.2f}s  {count / elapsed:>10,.0f} orders/s")
+    return result
+
+
+async def in_batches(create, client: edgedb.AsyncIOClient, items: List[OrderItem], batch: int) -> List[uuid.UUID]:
+    """Заказы пачками по корзине, чтобы обе реализации делали одинаковые транзакции"""
+    order_ids = []
+    for start in range(0, len(items), batch):
+        order_ids += await create(client, items[start:start + batch])
+    return order_ids
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Per-order create_order vs batched create_orders")
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=100, help="заказов в одном create_orders")
+    parser.add_argument("--products", type=int, default=50)
+    args = parser.parse_args()
+
+    client = edgedb.create_async_client()
+    try:
+        await cleanup(client)
+        user_id, product_ids = await seed(client, args.products)
+        rnd = random.Random(0)
+        items = [OrderItem(user_id, rnd.choice(product_ids), rnd.randint(1, 5)) for _ in range(args.orders)]
+
+        one_by_one = await timed(
+            "create_order", args.orders, in_batches(create_orders_one_by_one, client, items, args.batch)
+        )
+        batched = await timed(
+            f"create_orders x{args.batch}", args.orders, in_batches(create_orders, client, items, args.batch)
+        )
+        assert len(one_by_one) == len(batched) == args.orders
+
+        # товар кончился - пакет отклоняется целиком
+        await client.execute("UPDATE Product FILTER .id = <uuid>$id SET { in_stock := false }", id=product_ids[0])
+        count = await client.query_single("SELECT count(Order)")
+        try:
+            await create_orders(client, [OrderItem(user_id, product_ids[1], 1), OrderItem(user_id, product_ids[0], 1)])
+        except ValueError as error:
+            print(f"rejected: {error}")
+        assert await client.query_single("SELECT count(Order)") == count
+    finally:
+        await cleanup(client)
+        await client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+import uuid
+from pathlib import Path
+from typing import List, NamedTuple, Sequence
+
+import edgedb
+
+QUERIES = Path(__file__).parent / "queries"
+
+
+def load_query(name: str) -> str:
+    """Текст запроса из queries/, те же файлы, из которых генерирует код edgedb-py"""
+    return (QUERIES / f"{name}.edgeql").read_text()
+
+
+CHECK_PRODUCT_QUERY = load_query("check_product_for_order")
+CREATE_ORDER_QUERY = load_query("create_order")
+CREATE_ORDERS_QUERY = load_query("create_orders")
+
+
+class OrderItem(NamedTuple):
+    user_id: uuid.UUID
+    product_id: uuid.UUID
+    quantity: int
+
+
+async def create_orders(client: edgedb.AsyncIOClient, items: Sequence[OrderItem]) -> List[uuid.UUID]:
+    """Создание заказов одним запросом create_orders.edgeql.
+
+    Проверка наличия всех товаров и все вставки - один round-trip и одна
+    транзакция: если какого-то товара нет, не создается ни один заказ.
+    """
+    if not items:
+        return []
+
+    try:
+        orders = await client.query(
+            CREATE_ORDERS_QUERY,
+            user_ids=[item.user_id for item in items],
+            product_ids=[item.product_id for item in items],
+            quantities=[item.quantity for item in items],
+        )
+    except edgedb.CardinalityViolationError as error:
+        raise ValueError(str(error)) from error
+    return [order.id for order in orders]
+
+
+async def create_orders_one_by_one(client: edgedb.AsyncIOClient, items: Sequence[OrderItem]) -> List[uuid.UUID]:
+    """То же через check_product_for_order и create_order: два round-trip на заказ"""
+    async for transaction in client.transaction():
+        async with transaction:
+            order_ids = []
+            for item in items:
+                product = await transaction.query_single(CHECK_PRODUCT_QUERY, product_id=item.product_id)
+                if product is None or not product.in_stock:
+                    raise ValueError(f"Product {item.product_id} not found or out of stock")
+
+                order = await transaction.query_single(
+                    CREATE_ORDER_QUERY,
+                    user_id=item.user_id,
+                    product_id=item.product_id,
+                    quantity=item.quantity,
+                )
+                order_ids.append(order.id)
+    return order_ids
@@ -0,0 +1,145 @@
+"""Один и тот же сценарий через три репозитория с QueryStats.
+
+    python compare_query_stats.py --dsn postgres:password@localhost:5432/hw4_db --out stats/
+
+Сценарий: регистрации, чтение профилей и страница списка, которая
+нарочно дочитывает каждого пользователя отдельно (N+1).
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import sys
+import uuid
+from pathlib import Path
+from types import ModuleType
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from query_stats import QueryStats
+
+HERE = Path(__file__).parent
+
+
+def load(directory: str, name: str) -> ModuleType:
+    """main.py подпроекта под уникальным именем: во всех трех он называется main"""
+    path = HERE / directory
+    sys.path.insert(0, str(path))
+    try:
+        spec = importlib.util.spec_from_file_location(name, path / "main.py")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        sys.path.remove(str(path))
+
+
+async def run_asyncpg(dsn: str, emails: list, details: int) -> QueryStats:
+    raw = load("1_raw_asyncpg", "raw_asyncpg_main")
+    stats = QueryStats("asyncpg")
+    repository = raw.UserRepository(f"postgresql://{dsn}")
+    await repository.initialize(**stats.asyncpg_pool_options(raw.HOT_STATEMENTS))
+
+    try:
+        ids = []
+        for email in emails:
+            with stats.request("signup"):
+                ids.append(await repository.create_user(email, "Query Stats", 30))
+        for user_id in ids:
+            with stats.request("profile"):
+                await repository.get_user_by_id(user_id)
+        with stats.request("list_with_details"):
+            for user in (await repository.get_users_with_orders())[:details]:
+                await repository.get_user_by_id(user["id"])
+    finally:
+        await repository.close()
+    return stats
+
+
+def run_sqlmodel(dsn: str, emails: list, details: int) -> QueryStats:
+    active_record = load("2_active_record", "active_record_main")
+    stats = QueryStats("sqlmodel")
+    engine = create_engine(f"postgresql+psycopg2://{dsn}")
+    stats.instrument_engine(engine)
+
+    with active_record.Session(engine) as session:
+        ids = []
+        for email in emails:
+            with stats.request("signup"):
+                ids.append(active_record.User.create(session, email, "Query Stats", 30).id)
+        for user_id in ids:
+            with stats.request("profile"):
+                active_record.User.find_by_id(session, user_id)
+        with stats.request("list_with_details"):
+            for user in active_record.User.get_all_with_stats(session)[:details]:
+                # как в обработчике, у которого своя сессия на запрос
+                session.expunge_all()
+                active_record.User.find_by_id(session, user["id"])
+
+    engine.dispose()
+    return stats
+
+
+def run_data_mapper(dsn: str, emails: list, details: int) -> QueryStats:
+    data_mapper = load("3_data_mapper_sqlalchemy", "data_mapper_main")
+    stats = QueryStats("data_mapper")
+    engine = create_engine(f"postgresql+psycopg2://{dsn}")
+    stats.instrument_engine(engine)
+
+    ids = []
+    for email in emails:
+        with stats.request("signup"), Session(engine) as session:
+            service = data_mapper.UserService(data_mapper.SqlAlchemyUserRepository(session))
+            ids.append(service.create_user(email, "Query Stats", 30).id)
+            session.commit()
+    for user_id in ids:
+        with stats.request("profile"), Session(engine) as session:
+            data_mapper.UserService(data_mapper.SqlAlchemyUserRepository(session)).get_user_with_validation(user_id)
+    with stats.request("list_with_details"), Session(engine) as session:
+        repository = data_mapper.SqlAlchemyUserRepository(session)
+        for user in repository.get_all()[:details]:
+            with Session(engine) as other:
+                data_mapper.SqlAlchemyUserRepository(other).find_by_id(user.id)
+
+    engine.dispose()
+    return stats
+
+
+def cleanup(dsn: str):
+    engine = create_engine(f"postgresql+psycopg2://{dsn}")
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM users WHERE email LIKE 'qs-%'"))
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-statement stats of the three lecture4 repositories")
+    parser.add_argument("--dsn", default="postgres:password@localhost:5432/hw4_db", help="user:password@host:port/db")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--details", type=int, default=50, help="пользователей, дочитываемых по одному в list_with_details")
+    parser.add_argument("--out", help="каталог для JSON-отчетов")
+    args = parser.parse_args()
+
+    runs = {
+        "asyncpg": lambda emails: asyncio.run(run_asyncpg(args.dsn, emails, args.details)),
+        "sqlmodel": lambda emails: run_sqlmodel(args.dsn, emails, args.details),
+        "data_mapper": lambda emails: run_data_mapper(args.dsn, emails, args.details),
+    }
+
+    for name, run in runs.items():
+        cleanup(args.dsn)
+        emails = [f"qs-{uuid.uuid4().hex}@example.com" for _ in range(args.users)]
+        try:
+            stats = run(emails)
+        finally:
+            cleanup(args.dsn)
+
+        print(stats.report(), end="\n\n")
+        if args.out:
+            os.makedirs(args.out, exist_ok=True)
+            stats.dump(os.path.join(args.out, f"{name}.json"))
+
+
+if __name__ == "__main__":
+    main()
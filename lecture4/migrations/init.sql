@@ -1,4 +1,5 @@
 -- Создание схемы базы данных для примеров
+DROP TABLE IF EXISTS user_order_stats CASCADE;
 DROP TABLE IF EXISTS orders CASCADE;
 DROP TABLE IF EXISTS products CASCADE;
 DROP TABLE IF EXISTS users CASCADE;
@@ -36,11 +37,22 @@ CREATE TABLE orders (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Статистика заказов по пользователю, ее поддерживают триггеры ниже,
+-- чтобы не пересчитывать JOIN/GROUP BY по всей таблице orders
+CREATE TABLE user_order_stats (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    order_count INTEGER NOT NULL DEFAULT 0,
+    total_spent DECIMAL(12, 2) NOT NULL DEFAULT 0
+);
+
 -- Индексы для оптимизации запросов
 CREATE INDEX idx_users_email ON users(email);
+-- keyset-пагинация по (created_at, id)
+CREATE INDEX idx_users_created_at_id ON users(created_at, id);
 CREATE INDEX idx_orders_user_id ON orders(user_id);
 CREATE INDEX idx_orders_product_id ON orders(product_id);
 CREATE INDEX idx_orders_status ON orders(status);
+CREATE INDEX idx_user_order_stats_total_spent ON user_order_stats(total_spent DESC);
 
 -- Триггер для автоматического обновления updated_at
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -60,6 +72,50 @@ CREATE TRIGGER update_products_updated_at BEFORE UPDATE ON products
 CREATE TRIGGER update_orders_updated_at BEFORE UPDATE ON orders
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Триггеры для user_order_stats: строка с нулями появляется вместе с
+-- пользователем, заказы меняют ее инкрементально
+CREATE OR REPLACE FUNCTION create_user_order_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO user_order_stats (user_id) VALUES (NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_user_order_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE user_order_stats
+        SET order_count = order_count - 1,
+            total_spent = total_spent - OLD.total_price
+        WHERE user_id = OLD.user_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO user_order_stats (user_id, order_count, total_spent)
+        VALUES (NEW.user_id, 1, NEW.total_price)
+        ON CONFLICT (user_id) DO UPDATE
+        SET order_count = user_order_stats.order_count + 1,
+            total_spent = user_order_stats.total_spent + EXCLUDED.total_spent;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER create_users_order_stats AFTER INSERT ON users
+    FOR EACH ROW EXECUTE FUNCTION create_user_order_stats();
+
+CREATE TRIGGER update_orders_user_stats AFTER INSERT OR DELETE ON orders
+    FOR EACH ROW EXECUTE FUNCTION update_user_order_stats();
+
+-- статусы и количество на статистику не влияют
+CREATE TRIGGER update_orders_user_stats_on_change AFTER UPDATE OF user_id, total_price ON orders
+    FOR EACH ROW
+    WHEN (OLD.user_id IS DISTINCT FROM NEW.user_id OR OLD.total_price IS DISTINCT FROM NEW.total_price)
+    EXECUTE FUNCTION update_user_order_stats();
+
 -- Вставка тестовых данных
 INSERT INTO users (email, name, age) VALUES
     ('alice@example.com', 'Alice Johnson', 28),
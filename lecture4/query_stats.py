@@ -0,0 +1,240 @@
+"""Статистика запросов к БД, общая для всех репозиториев lecture4.
+
+- asyncpg: пул создается с `QueryStats.asyncpg_pool_options(...)` - свой
+  класс соединения считает fetch*/execute, а горячие запросы готовятся
+  (PREPARE) сразу при открытии соединения.
+- SQLAlchemy и SQLModel: `QueryStats.instrument_engine(engine)` вешает
+  обработчики before/after_cursor_execute на Engine или AsyncEngine.
+
+Внутри `with stats.request("name"):` запросы дополнительно считаются по
+запросу приложения: один и тот же запрос, выполненный хотя бы
+`n_plus_one_threshold` раз, помечается как вероятный N+1.
+"""
+import json
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# сколько длительностей на запрос хранить для p99 (reservoir sampling)
+SAMPLE_SIZE = 10_000
+
+
+def normalize(statement: str) -> str:
+    return " ".join(statement.split())
+
+
+def _status_rows(status: str) -> int:
+    """Число строк из статуса asyncpg вида `UPDATE 3` или `INSERT 0 3`"""
+    tail = status.rsplit(" ", 1)[-1]
+    return int(tail) if tail.isdigit() else 0
+
+
+@dataclass
+class StatementStats:
+    calls: int = 0
+    total: float = 0.0
+    rows: int = 0
+    # asyncpg: запрос из подготовленных при открытии соединения,
+    # SQLAlchemy: SQL взят из кэша компиляции
+    reused: int = 0
+    errors: int = 0
+    samples: List[float] = field(default_factory=list)
+
+    def record(self, duration: float, rows: int, reused: bool, failed: bool, rnd: random.Random):
+        self.calls += 1
+        self.total += duration
+        self.rows += rows
+        self.reused += reused
+        self.errors += failed
+
+        if len(self.samples) < SAMPLE_SIZE:
+            self.samples.append(duration)
+        elif (slot := rnd.randrange(self.calls)) < SAMPLE_SIZE:
+            self.samples[slot] = duration
+
+    @property
+    def p99(self) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "total_ms": self.total * 1e3,
+            "mean_ms": self.total / self.calls * 1e3 if self.calls else 0.0,
+            "p99_ms": self.p99 * 1e3,
+            "rows": self.rows,
+            "reused": self.reused,
+            "errors": self.errors,
+        }
+
+
+_current_request: ContextVar[Optional[Tuple[str, Counter]]] = ContextVar("query_stats_request", default=None)
+
+
+class QueryStats:
+    def __init__(self, name: str, n_plus_one_threshold: int = 10):
+        self.name = name
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.statements: Dict[str, StatementStats] = {}
+        # (запрос приложения, SQL) -> наибольшее число повторов за один запрос
+        self.n_plus_one: Dict[Tuple[str, str], int] = {}
+        self._rnd = random.Random(0)
+
+    def record(self, statement: str, duration: float, rows: int = 0, reused: bool = False, failed: bool = False):
+        statement = normalize(statement)
+        if (stats := self.statements.get(statement)) is None:
+            stats = self.statements[statement] = StatementStats()
+        stats.record(duration, rows, reused, failed, self._rnd)
+
+        if (current := _current_request.get()) is not None:
+            current[1][statement] += 1
+
+    @contextmanager
+    def request(self, name: str) -> Iterator[None]:
+        """Границы одного запроса приложения для поиска N+1"""
+        token = _current_request.set((name, Counter()))
+        try:
+            yield
+        finally:
+            _, counts = _current_request.get()
+            _current_request.reset(token)
+
+            for statement, count in counts.items():
+                if count >= self.n_plus_one_threshold:
+                    key = (name, statement)
+                    self.n_plus_one[key] = max(count, self.n_plus_one.get(key, 0))
+
+    # === asyncpg ===
+
+    def asyncpg_pool_options(self, hot_statements: Iterable[str] = ()) -> dict:
+        """Аргументы для asyncpg.create_pool: класс соединения и init"""
+        import asyncpg
+
+        stats = self
+        hot_statements = frozenset(hot_statements)
+
+        class InstrumentedConnection(asyncpg.Connection):
+            # служебные запросы пула и прогрева не считаем
+            _service = False
+
+            async def reset(self, *, timeout=None):
+                self._service = True
+                try:
+                    await super().reset(timeout=timeout)
+                finally:
+                    self._service = False
+
+            async def fetch(self, query, *args, timeout=None, record_class=None):
+                call = super().fetch(query, *args, timeout=timeout, record_class=record_class)
+                if self._service:
+                    return await call
+                return await stats._timed(query, call, len, query in hot_statements)
+
+            async def fetchrow(self, query, *args, timeout=None, record_class=None):
+                call = super().fetchrow(query, *args, timeout=timeout, record_class=record_class)
+                return await stats._timed(query, call, lambda row: int(row is not None), query in hot_statements)
+
+            async def fetchval(self, query, *args, column=0, timeout=None):
+                call = super().fetchval(query, *args, column=column, timeout=timeout)
+                return await stats._timed(query, call, lambda value: 1, query in hot_statements)
+
+            async def execute(self, query, *args, timeout=None):
+                call = super().execute(query, *args, timeout=timeout)
+                if self._service:
+                    return await call
+                return await stats._timed(query, call, _status_rows, query in hot_statements)
+
+        async def init(connection):
+            # PreparedStatement из connection.prepare() живет только до возврата
+            # соединения в пул, поэтому прогревается собственный кэш запросов
+            # asyncpg: он переживает возвраты. fetch без аргументов кладет
+            # запрос в кэш после PREPARE и падает на проверке их числа еще до
+            # выполнения, а запрос без параметров откатывается с транзакцией
+            connection._service = True
+            transaction = connection.transaction()
+            await transaction.start()
+            try:
+                for query in hot_statements:
+                    with suppress(asyncpg.InterfaceError):
+                        await connection.fetch(query)
+            finally:
+                await transaction.rollback()
+                connection._service = False
+
+        return {"connection_class": InstrumentedConnection, "init": init}
+
+    async def _timed(self, query: str, call: Awaitable, count_rows: Callable[[Any], int], reused: bool):
+        start = time.perf_counter()
+        rows, failed = 0, True
+        try:
+            result = await call
+            rows, failed = count_rows(result), False
+            return result
+        finally:
+            self.record(query, time.perf_counter() - start, rows, reused, failed)
+
+    # === SQLAlchemy ===
+
+    def instrument_engine(self, engine) -> None:
+        """Обработчики на Engine/AsyncEngine: время, строки и попадания в кэш компиляции"""
+        from sqlalchemy import event
+        from sqlalchemy.engine.default import CACHE_HIT
+
+        engine = getattr(engine, "sync_engine", engine)
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_stats_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            duration = time.perf_counter() - conn.info["query_stats_start"].pop()
+            reused = context is not None and context.cache_hit == CACHE_HIT
+            # sqlite не знает число строк SELECT до выборки и отдает -1
+            self.record(statement, duration, max(cursor.rowcount, 0), reused)
+
+        @event.listens_for(engine, "handle_error")
+        def handle_error(exception_context):
+            starts = exception_context.connection.info.get("query_stats_start") if exception_context.connection else None
+            if starts and exception_context.statement is not None:
+                self.record(exception_context.statement, time.perf_counter() - starts.pop(), failed=True)
+
+    # === Отчет ===
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "statements": {statement: stats.to_dict() for statement, stats in self.statements.items()},
+            "n_plus_one": [
+                {"request": request, "statement": statement, "count": count}
+                for (request, statement), count in self.n_plus_one.items()
+            ],
+        }
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2, ensure_ascii=False)
+
+    def report(self, width: int = 70) -> str:
+        lines = [
+            f"== {self.name}",
+            f"{'statement':<{width}} {'calls':>7} {'total ms':>9} {'mean ms':>8} {'p99 ms':>8} {'rows':>7} {'reused':>7}",
+        ]
+        for statement, stats in sorted(self.statements.items(), key=lambda item: -item[1].total):
+            data = stats.to_dict()
+            text = statement if len(statement) <= width else statement[:width - 3] + "..."
+            lines.append(
+                f"{text:<{width}} {data['calls']:>7} {data['total_ms']:>9.1f} {data['mean_ms']:>8.3f} "
+                f"{data['p99_ms']:>8.3f} {data['rows']:>7} {data['reused']:>7}"
+            )
+
+        for (request, statement), count in self.n_plus_one.items():
+            lines.append(f"N+1? {request}: {count} x {statement[:width]}")
+        return "\n".join(lines)
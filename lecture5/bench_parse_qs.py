@@ -0,0 +1,37 @@
+import argparse
+import timeit
+from urllib.parse import parse_qs as urllib_parse_qs
+
+from example_parse_qs import parse_qs
+
+QUERIES = {
+    "plain": "name=John&age=30&city=London&page=2&sort=created_at&order=desc",
+    "encoded": "name=John+Smith&city=New%20York&q=%D0%BF%D1%80%D0%B8%D0%B2%D0%B5%D1%82&tag=a&tag=b",
+    "long": "&".join(f"key{i}=value{i}" for i in range(200)),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="example_parse_qs.parse_qs vs urllib.parse.parse_qs")
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+
+    for name, query in QUERIES.items():
+        raw = query.encode()
+        # urllib на bytes возвращает bytes и падает на не-ASCII после
+        # декодирования, поэтому ему bytes декодируются заранее, как в обработчике
+        for label, ours_call, theirs_call in (
+            ("str", lambda: parse_qs(query), lambda: urllib_parse_qs(query, keep_blank_values=True)),
+            ("bytes", lambda: parse_qs(raw), lambda: urllib_parse_qs(raw.decode(), keep_blank_values=True)),
+        ):
+            ours = min(timeit.repeat(ours_call, number=args.number, repeat=5))
+            # keep_blank_values, чтобы `key=` не терялся, как и у нас
+            theirs = min(timeit.repeat(theirs_call, number=args.number, repeat=5))
+            print(
+                f"{name:>8} {label:>5}: parse_qs {ours / args.number * 1e6:7.2f}us  "
+                f"urllib {theirs / args.number * 1e6:7.2f}us  x{theirs / ours:.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,261 @@
 import asyncio
-from typing import Awaitable, Callable, Iterable
+import random
+import time
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Awaitable, Callable, Generator, Iterable, Iterator, Optional
 
+# сколько вызовов func одновременно держит map_async по умолчанию
+DEFAULT_CONCURRENCY = 100
+# ошибки, после которых вызов повторяется: сеть и таймауты, но не баги в func
+RETRY_ON = (TimeoutError, OSError)
 
-async def map_async[_TVal, _TRes](
+
+class MapAsync[_TVal, _TRes]:
+    """Результат map_async: и асинхронный итератор, и awaitable.
+
+    `async for result in map_async(...)` отдает результаты по мере готовности,
+    `await map_async(...)` собирает их в список. Одновременно выполняется не
+    больше `concurrency` вызовов, а значения из `values` берутся по одному,
+    когда освобождается место, поэтому подходят ленивые и бесконечные
+    итераторы. Ошибка любого вызова отменяет остальные и пробрасывается
+    сразу, не дожидаясь своей очереди в упорядоченном режиме. Итерироваться
+    можно один раз.
+    """
+
+    def __init__(
+        self,
+        func: Callable[[_TVal], Awaitable[_TRes]],
+        values: Iterable[_TVal],
+        concurrency: int,
+        ordered: bool,
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        self._func = func
+        self._values = iter(values)
+        self._concurrency = concurrency
+        self._ordered = ordered
+
+    def __aiter__(self) -> AsyncIterator[_TRes]:
+        return self._iterate_ordered() if self._ordered else self._iterate_unordered()
+
+    def __await__(self) -> Generator[None, None, list[_TRes]]:
+        return self._collect().__await__()
+
+    async def _collect(self) -> list[_TRes]:
+        return [result async for result in self]
+
+    def _start(self, limit: int) -> Iterator[asyncio.Future[_TRes]]:
+        # задачи отдаются по одной: если `values` упадет посреди пачки, уже
+        # запущенные успеют попасть в окно и будут отменены при выходе
+        for value in islice(self._values, limit):
+            yield asyncio.ensure_future(self._func(value))
+
+    async def _iterate_ordered(self) -> AsyncIterator[_TRes]:
+        # окно из запущенных вызовов в порядке входа: готовые, но еще не
+        # отданные результаты тоже занимают в нем место, так что память
+        # ограничена `concurrency` даже при медленном первом вызове
+        window: deque[asyncio.Future[_TRes]] = deque()
+        failed: list[asyncio.Future[_TRes]] = []
+
+        def on_done(task: asyncio.Future[_TRes]):
+            if task.cancelled() or task.exception() is not None:
+                failed.append(task)
+
+        try:
+            while True:
+                if failed:
+                    failed[0].result()
+
+                for task in self._start(self._concurrency - len(window)):
+                    task.add_done_callback(on_done)
+                    window.append(task)
+                if not window:
+                    return
+
+                if window[0].done():
+                    yield window.popleft().result()
+                else:
+                    running = [task for task in window if not task.done()]
+                    await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            await _cancel(window)
+
+    async def _iterate_unordered(self) -> AsyncIterator[_TRes]:
+        running: set[asyncio.Future[_TRes]] = set()
+        ready: deque[asyncio.Future[_TRes]] = deque()
+
+        try:
+            while True:
+                for task in self._start(self._concurrency - len(running) - len(ready)):
+                    running.add(task)
+
+                if ready:
+                    yield ready.popleft().result()
+                elif running:
+                    done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    ready.extend(done)
+                else:
+                    return
+        finally:
+            await _cancel([*running, *ready])
+
+
+async def _cancel(tasks: Iterable[asyncio.Future]):
+    """Отмена и ожидание задач: без ожидания их исключения никто не заберет"""
+    tasks = list(tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def map_async[_TVal, _TRes](
     func: Callable[[_TVal], Awaitable[_TRes]],
     values: Iterable[_TVal],
-) -> Iterable[_TRes]:
-    return await asyncio.gather(*(func(value) for value in values))
+    concurrency: int = DEFAULT_CONCURRENCY,
+    ordered: bool = True,
+) -> MapAsync[_TVal, _TRes]:
+    """Асинхронный map с ограничением параллельности, см. MapAsync.
+
+    `ordered=False` отдает результаты в порядке завершения: медленный вызов
+    не задерживает готовые после него.
+    """
+    return MapAsync(func, values, concurrency, ordered)
+
+
+class TokenBucket:
+    """Не больше `rate` разрешений в секунду, в запас копится до `burst`.
+
+    Ждущие acquire обслуживаются по очереди (FIFO). `rate` можно менять на
+    ходу: накопленное к этому моменту считается по старой скорости.
+    """
+
+    def __init__(self, rate: float, burst: float = 1, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self._rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = burst
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @rate.setter
+    def rate(self, rate: float):
+        self._refill()
+        self._rate = rate
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class Aimd:
+    """Подстройка скорости TokenBucket: additive increase, multiplicative decrease.
+
+    Успешный вызов прибавляет к скорости `increase / rate`, то есть около
+    `increase` в секунду при работе на полной скорости. Ошибка или вызов
+    дольше `latency_target` умножают скорость на `decrease`, но не чаще раза
+    в `cooldown` секунд: пачка ошибок от уже отправленных вызовов - это одна
+    перегрузка, а не несколько.
+    """
+
+    def __init__(
+        self,
+        min_rate: float = 1,
+        max_rate: float = 1000,
+        increase: float = 1,
+        decrease: float = 0.5,
+        latency_target: Optional[float] = None,
+        cooldown: float = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self._clock = clock
+        self._decreased_at: Optional[float] = None
+
+    def on_success(self, bucket: TokenBucket, latency: float):
+        if self.latency_target is not None and latency > self.latency_target:
+            self.on_failure(bucket)
+        else:
+            bucket.rate = min(self.max_rate, bucket.rate + self.increase / bucket.rate)
+
+    def on_failure(self, bucket: TokenBucket):
+        now = self._clock()
+        if self._decreased_at is not None and now - self._decreased_at < self.cooldown:
+            return
+        self._decreased_at = now
+        bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+
+
+def rate_limited_map_async[_TVal, _TRes](
+    func: Callable[[_TVal], Awaitable[_TRes]],
+    values: Iterable[_TVal],
+    rate: float,
+    burst: float = 1,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: Optional[float] = None,
+    retries: int = 0,
+    backoff: float = 0.1,
+    max_backoff: float = 10,
+    retry_on: tuple[type[BaseException], ...] = RETRY_ON,
+    aimd: Optional[Aimd] = None,
+    ordered: bool = True,
+) -> MapAsync[_TVal, _TRes]:
+    """map_async, который начинает не больше `rate` вызовов в секунду.
+
+    Каждая попытка берет разрешение из TokenBucket, где в запасе копится до
+    `burst` разрешений, и ограничена `timeout` секундами. Ошибки из
+    `retry_on` (TimeoutError включен) повторяются до `retries` раз с паузой
+    `random.uniform(0, backoff * 2 ** attempt)`, не больше `max_backoff`:
+    случайная пауза разводит повторы во времени, чтобы они не били в сервис
+    одной волной. С `aimd` скорость подстраивается под ошибки и задержки,
+    `rate` - только стартовая.
+    """
+    if retries < 0:
+        raise ValueError("retries must be non-negative")
+
+    bucket = TokenBucket(rate, burst)
+
+    async def call(value: _TVal) -> _TRes:
+        for attempt in range(retries + 1):
+            await bucket.acquire()
+            start = time.monotonic()
+            try:
+                result = await asyncio.wait_for(func(value), timeout)
+            except retry_on:
+                if aimd is not None:
+                    aimd.on_failure(bucket)
+                if attempt == retries:
+                    raise
+                await asyncio.sleep(random.uniform(0, min(max_backoff, backoff * 2 ** attempt)))
+            else:
+                if aimd is not None:
+                    aimd.on_success(bucket, time.monotonic() - start)
+                return result
+
+    return map_async(call, values, concurrency, ordered)
 
 
 async def slow_map_async[_TVal, _TRes](
@@ -1,9 +1,63 @@
+import re
 from sys import argv
 
+# больше параметров в одной строке запроса не разбираем: иначе запрос
+# из миллиона `&` заставит построить миллион строк и словарь под них
+MAX_PARAMS = 1000
 
-def parse_qs(query_string):
-    # это код который я взял из реализации 1-го ДЗ одного из студентов
-    return dict(param.split("=") for param in query_string.split("&") if "=" in param)
+# подряд идущие %XX декодируются вместе: многобайтный UTF-8 символ
+# собирается целиком одним bytes.fromhex, это в 2-4 раза быстрее unquote
+_PERCENT_RUN = re.compile(r"(?:%[0-9A-Fa-f]{2})+")
+
+
+def _unquote_run(match: re.Match) -> str:
+    return bytes.fromhex(match.group().replace("%", "")).decode("utf-8", "replace")
+
+
+def _decode(part: str) -> str:
+    if "+" in part:
+        part = part.replace("+", " ")
+    if "%" in part:
+        part = _PERCENT_RUN.sub(_unquote_run, part)
+    return part
+
+
+def parse_qs(query_string: str | bytes, max_params: int = MAX_PARAMS) -> dict[str, str | list[str]]:
+    """Разбор строки запроса `a=1&b=2&b=3` в `{"a": "1", "b": ["2", "3"]}`.
+
+    - значение делится по первому `=`, так что `a=b=c` дает `{"a": "b=c"}`;
+    - повторяющийся ключ собирается в список, одиночный остается строкой;
+    - `+` и `%XX` декодируются, только если они вообще есть в строке;
+    - параметры без `=` и пустые куски между `&&` пропускаются;
+    - bytes декодируются как UTF-8, результат всегда из str.
+
+    Если параметров больше `max_params`, бросает ValueError.
+    """
+    if isinstance(query_string, bytes):
+        query_string = query_string.decode("utf-8", "replace")
+
+    if query_string.count("&") >= max_params:
+        raise ValueError(f"Too many query parameters, max is {max_params}")
+
+    encoded = "%" in query_string or "+" in query_string
+    result: dict[str, str | list[str]] = {}
+
+    for param in query_string.split("&"):
+        key, sep, value = param.partition("=")
+        if not sep:
+            continue
+        if encoded:
+            key, value = _decode(key), _decode(value)
+
+        previous = result.get(key)
+        if previous is None:
+            result[key] = value
+        elif isinstance(previous, list):
+            previous.append(value)
+        else:
+            result[key] = [previous, value]
+
+    return result
 
 
 if __name__ == "__main__":
@@ -1,6 +1,11 @@
+import asyncio
+import itertools
+import time
+from contextlib import aclosing
+
 import pytest
 
-from lecture5.example_async import map_async, slow_map_async
+from lecture5.example_async import Aimd, TokenBucket, map_async, rate_limited_map_async, slow_map_async
 from lecture5.tests.conftest import to_str_async
 
 
@@ -33,3 +38,208 @@ async def test_map_async_parametrized(
 async def test_slow_map_async(int_list) -> None:
     result = await slow_map_async(to_str_async, int_list)
     assert result == ["1", "2", "3", "4", "5"]
+
+
+async def sleep_and_return(delay: float) -> float:
+    await asyncio.sleep(delay)
+    return delay
+
+
+@pytest.mark.asyncio
+async def test_map_async_respects_concurrency() -> None:
+    running = max_running = 0
+
+    async def track(value: int) -> int:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return value
+
+    result = await map_async(track, range(20), concurrency=3)
+
+    assert result == list(range(20))
+    assert max_running == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("ordered", "expected_result"),
+    [
+        (True, [0.03, 0.01, 0.02]),
+        (False, [0.01, 0.02, 0.03]),
+    ],
+)
+async def test_map_async_streams_results(ordered: bool, expected_result: list) -> None:
+    result = [value async for value in map_async(sleep_and_return, [0.03, 0.01, 0.02], ordered=ordered)]
+    assert result == expected_result
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ordered", [True, False])
+async def test_map_async_infinite_iterable(ordered: bool) -> None:
+    started = []
+
+    async def record(value: int) -> int:
+        started.append(value)
+        await asyncio.sleep(0)
+        return value
+
+    async with aclosing(aiter(map_async(record, itertools.count(), concurrency=4, ordered=ordered))) as results:
+        first = [await anext(results) for _ in range(10)]
+
+    assert len(first) == 10
+    assert len(started) < 10 + 4 + 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ordered", [True, False])
+async def test_map_async_error_cancels_the_rest(ordered: bool) -> None:
+    cancelled = []
+
+    async def fail_or_wait(value: int) -> int:
+        if value == 1:
+            raise RuntimeError("boom")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(value)
+            raise
+        return value
+
+    # первый вызов упорядоченного режима висит, но ошибка второго не ждет его
+    with pytest.raises(RuntimeError, match="boom"):
+        await asyncio.wait_for(map_async(fail_or_wait, range(5), ordered=ordered), timeout=1)
+
+    assert sorted(cancelled) == [0, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ordered", [True, False])
+async def test_map_async_values_error_cancels_started(ordered: bool) -> None:
+    finished = []
+
+    async def wait(value: int) -> int:
+        await asyncio.sleep(0.05)
+        finished.append(value)
+        return value
+
+    def values():
+        yield 1
+        yield 2
+        raise RuntimeError("broken iterator")
+
+    # ошибка итератора посреди пачки: уже запущенные вызовы не должны остаться висеть
+    with pytest.raises(RuntimeError, match="broken iterator"):
+        await asyncio.wait_for(map_async(wait, values(), ordered=ordered), timeout=1)
+
+    await asyncio.sleep(0.1)
+    assert finished == []
+    assert asyncio.all_tasks() == {asyncio.current_task()}
+
+
+def test_map_async_invalid_concurrency() -> None:
+    with pytest.raises(ValueError, match="concurrency"):
+        map_async(to_str_async, [1], concurrency=0)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_acquires() -> None:
+    bucket = TokenBucket(rate=200)
+    start = time.monotonic()
+    for _ in range(11):
+        await bucket.acquire()
+    assert time.monotonic() - start >= 10 / 200
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_map_async() -> None:
+    start = time.monotonic()
+    result = await rate_limited_map_async(to_str_async, range(11), rate=200, concurrency=4)
+
+    assert result == [str(value) for value in range(11)]
+    assert time.monotonic() - start >= 10 / 200
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_map_async_burst() -> None:
+    start = time.monotonic()
+    result = await rate_limited_map_async(to_str_async, range(5), rate=1, burst=5)
+
+    assert result == [str(value) for value in range(5)]
+    assert time.monotonic() - start < 0.5  # весь запас сразу, без ожидания rate
+
+
+def test_rate_limited_map_async_invalid_retries() -> None:
+    with pytest.raises(ValueError, match="retries"):
+        rate_limited_map_async(to_str_async, [1], rate=1, retries=-1)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(("retries", "succeeds"), [(2, True), (1, False)])
+async def test_rate_limited_map_async_retries(retries: int, succeeds: bool) -> None:
+    calls = 0
+
+    async def flaky(value: int) -> int:
+        nonlocal calls
+        calls += 1
+        if calls <= 2:
+            raise ConnectionError("flaky")
+        return value
+
+    call = rate_limited_map_async(flaky, [1], rate=1000, retries=retries, backoff=0.001)
+    if succeeds:
+        assert await call == [1]
+    else:
+        with pytest.raises(ConnectionError):
+            await call
+    assert calls == retries + 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_map_async_timeout_and_non_retryable() -> None:
+    with pytest.raises(TimeoutError):
+        await rate_limited_map_async(sleep_and_return, [1], rate=1000, timeout=0.01, retries=1, backoff=0.001)
+
+    calls = 0
+
+    async def broken(value: int) -> int:
+        nonlocal calls
+        calls += 1
+        raise ValueError("bug")
+
+    with pytest.raises(ValueError):
+        await rate_limited_map_async(broken, [1], rate=1000, retries=3)
+    assert calls == 1
+
+
+def test_aimd() -> None:
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, clock=clock)
+    aimd = Aimd(min_rate=2, max_rate=10.3, increase=2, latency_target=0.5, cooldown=1, clock=clock)
+
+    aimd.on_success(bucket, latency=0.1)
+    assert bucket.rate == pytest.approx(10.2)
+    aimd.on_success(bucket, latency=0.1)
+    assert bucket.rate == 10.3
+
+    aimd.on_failure(bucket)
+    assert bucket.rate == 5.15
+    aimd.on_failure(bucket)  # та же перегрузка, в пределах cooldown
+    assert bucket.rate == 5.15
+
+    clock.now = 1
+    aimd.on_success(bucket, latency=1)  # медленный ответ - тоже сигнал перегрузки
+    assert bucket.rate == pytest.approx(2.575)
+    clock.now = 2
+    aimd.on_failure(bucket)
+    assert bucket.rate == 2
@@ -5,7 +5,6 @@ import pytest
 from lecture5.example_parse_qs import parse_qs
 
 
-@pytest.mark.xfail()
 @pytest.mark.parametrize(
     ("query_string", "expected_result"),
     [
@@ -20,8 +19,21 @@ from lecture5.example_parse_qs import parse_qs
             {"name": "John", "age": "30", "city": "New York", "key": ""},
         ),
         ("name=John&name=Mary", {"name": ["John", "Mary"]}),
+        ("a=1&a=1&a=2", {"a": ["1", "1", "2"]}),
+        ("expr=a=b=c", {"expr": "a=b=c"}),
+        ("q=hello+world&tag=%D0%BF%D1%80%D0%B8%D0%B2%D0%B5%D1%82", {"q": "hello world", "tag": "привет"}),
+        ("a=1&&flag&b=2", {"a": "1", "b": "2"}),
+        ("", {}),
+        (b"name=John&city=New%20York", {"name": "John", "city": "New York"}),
     ],
 )
 def test_parse_qs_valid(query_string: str, expected_result: dict[str, Any]) -> None:
     result = parse_qs(query_string)
     assert result == expected_result
+
+
+def test_parse_qs_max_params() -> None:
+    assert parse_qs("&".join(["a=1"] * 3), max_params=3) == {"a": ["1", "1", "1"]}
+
+    with pytest.raises(ValueError, match="Too many"):
+        parse_qs("&".join(["a=1"] * 4), max_params=3)